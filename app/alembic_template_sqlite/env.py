@@ -1,10 +1,13 @@
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
+from sqlalchemy import engine_from_config, create_engine
 from sqlalchemy import pool
 
 from alembic import context
 import models
+from config import get_settings
+from database import default_bind_key, get_bind_key
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -20,6 +23,30 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = models.Base.metadata
 
+
+# SQLALCHEMY_DATABASE_BINDS에 설정한 database 파일마다 자기 table만 migration한다.
+# 기본 database는 alembic.ini의 sqlalchemy.url을 사용한다.
+def get_database_urls():
+    return {
+        default_bind_key: config.get_main_option("sqlalchemy.url"),
+        **get_settings().SQLALCHEMY_DATABASE_BINDS,
+    }
+
+
+def get_include_object(bind_key: str):
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ != "table":
+            return True
+
+        table = target_metadata.tables.get(name)
+        if table is None:
+            return bind_key == default_bind_key
+
+        return get_bind_key(table) == bind_key
+
+    return include_object
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -38,16 +65,19 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
-    context.configure(
-        url=url,
-        target_metadata=target_metadata,
-        literal_binds=True,
-        dialect_opts={"paramstyle": "named"},
-    )
+    for bind_key, url in get_database_urls().items():
+        context.configure(
+            url=url,
+            target_metadata=target_metadata,
+            literal_binds=True,
+            dialect_opts={"paramstyle": "named"},
+            include_object=get_include_object(bind_key),
+            upgrade_token=f"{bind_key}_upgrades",
+            downgrade_token=f"{bind_key}_downgrades",
+        )
 
-    with context.begin_transaction():
-        context.run_migrations()
+        with context.begin_transaction():
+            context.run_migrations(bind_key=bind_key)
 
 
 def run_migrations_online() -> None:
@@ -57,19 +87,28 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata,render_as_batch=True
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+    for bind_key, url in get_database_urls().items():
+        if bind_key == default_bind_key:
+            connectable = engine_from_config(
+                config.get_section(config.config_ini_section, {}),
+                prefix="sqlalchemy.",
+                poolclass=pool.NullPool,
+            )
+        else:
+            connectable = create_engine(url, poolclass=pool.NullPool)
+
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                render_as_batch=True,
+                include_object=get_include_object(bind_key),
+                upgrade_token=f"{bind_key}_upgrades",
+                downgrade_token=f"{bind_key}_downgrades",
+            )
+
+            with context.begin_transaction():
+                context.run_migrations(bind_key=bind_key)
 
 
 if context.is_offline_mode():
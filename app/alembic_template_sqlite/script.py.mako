@@ -18,9 +18,27 @@ branch_labels: Union[str, Sequence[str], None] = ${repr(branch_labels)}
 depends_on: Union[str, Sequence[str], None] = ${repr(depends_on)}
 
 
-def upgrade() -> None:
-    ${upgrades if upgrades else "pass"}
+<%
+    from config import get_settings
+    from database import default_bind_key
 
+    bind_keys = [default_bind_key, *get_settings().SQLALCHEMY_DATABASE_BINDS]
+%>
 
-def downgrade() -> None:
-    ${downgrades if downgrades else "pass"}
+def upgrade(bind_key: str) -> None:
+    globals()[f"upgrade_{bind_key}"]()
+
+
+def downgrade(bind_key: str) -> None:
+    globals()[f"downgrade_{bind_key}"]()
+
+% for bind_key in bind_keys:
+
+def upgrade_${bind_key}() -> None:
+    ${context.get(f"{bind_key}_upgrades", "pass")}
+
+
+def downgrade_${bind_key}() -> None:
+    ${context.get(f"{bind_key}_downgrades", "pass")}
+
+% endfor
@@ -3,19 +3,41 @@ from typing import Annotated
 import uuid
 
 from fastapi import Depends, HTTPException, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
+from sqlalchemy import exists, select, bindparam
+from sqlalchemy.orm.attributes import set_committed_value
 
 from models import (
     User,
     JWTAccessTokenBlackList,
     JWTRefreshTokenList,
     UserPermissionTable,
+    UserPermissionDenyTable,
+    Board,
+)
+from database import (
+    data_base_dependency,
+    read_data_base_dependency,
+    async_data_base_dependency,
+    run_after_commit,
+    run_and_commit,
 )
-from database import data_base_dependency
 from config import get_settings
 from http_execption_params import http_exception_params
+from password_executor import PasswordHashExecutor
+from rate_limiter import TokenBucketLimiter, SharedTokenBucketLimiter
+from auth_cache import (
+    AccessTokenRevocationCache,
+    UserTokenEpochCache,
+    UserBoardScopeCache,
+    JWTDecodeCache,
+    SharedAccessTokenRevocationSet,
+    SharedUserTokenEpochCache,
+    is_shared_memory_available,
+)
 
 
 # ref : https://github.com/tiangolo/fastapi/issues/2031
@@ -48,21 +70,155 @@ def get_password_context():
     return password_context
 
 
+# bcrypt 연산이 Starlette 기본 threadpool을 점유하지 않도록 별도 executor에서 실행한다.
+password_hash_executor = PasswordHashExecutor(
+    max_workers=get_settings().APP_PASSWORD_HASH_MAX_WORKERS,
+    max_queue_size=get_settings().APP_PASSWORD_HASH_MAX_QUEUE_SIZE,
+)
+
+
+def hash_password(password: str, password_salt: str):
+    return get_password_context().hash(password + password_salt)
+
+
+def verify_password(password: str, password_salt: str, hashed_password: str):
+    return get_password_context().verify(password + password_salt, hashed_password)
+
+
+async def hash_password_async(password: str, password_salt: str):
+    return await password_hash_executor.run(hash_password, password, password_salt)
+
+
+async def verify_password_async(
+    password: str, password_salt: str, hashed_password: str
+):
+    return await password_hash_executor.run(
+        verify_password, password, password_salt, hashed_password
+    )
+
+
 token_dependency = Annotated[str, Depends(get_oauth2_scheme_v1())]
 
 
+# 여러 worker process가 같은 폐기 정보를 보도록 가능하면 mmap 공유 메모리를 사용한다.
+if is_shared_memory_available() and get_settings().APP_TOKEN_REVOCATION_MMAP_PATH:
+    access_token_revocation_cache = SharedAccessTokenRevocationSet(
+        path=get_settings().APP_TOKEN_REVOCATION_MMAP_PATH,
+        slot_count=get_settings().APP_TOKEN_REVOCATION_MMAP_SLOTS,
+    )
+else:
+    access_token_revocation_cache = AccessTokenRevocationCache()
+
+if is_shared_memory_available() and get_settings().APP_TOKEN_EPOCH_MMAP_PATH:
+    user_token_epoch_cache = SharedUserTokenEpochCache(
+        path=get_settings().APP_TOKEN_EPOCH_MMAP_PATH,
+        slot_count=get_settings().APP_TOKEN_EPOCH_MMAP_SLOTS,
+        expire_seconds=get_settings().APP_JWT_EPOCH_CACHE_SECONDS,
+    )
+else:
+    user_token_epoch_cache = UserTokenEpochCache(
+        expire_seconds=get_settings().APP_JWT_EPOCH_CACHE_SECONDS
+    )
+
+# 권한 변경은 현재 worker의 캐시만 비우므로 다른 worker에는 최대 만료 시간만큼 늦게 반영된다.
+user_board_scope_cache = UserBoardScopeCache(
+    expire_seconds=get_settings().APP_JWT_SCOPE_CACHE_SECONDS
+)
+
+jwt_decode_cache = JWTDecodeCache(max_size=get_settings().APP_JWT_DECODE_CACHE_SIZE)
+
+if is_shared_memory_available() and get_settings().APP_LOGIN_RATE_LIMIT_MMAP_PATH:
+    login_rate_limiter = SharedTokenBucketLimiter(
+        path=get_settings().APP_LOGIN_RATE_LIMIT_MMAP_PATH,
+        slot_count=get_settings().APP_LOGIN_RATE_LIMIT_SIZE,
+    )
+else:
+    login_rate_limiter = TokenBucketLimiter(
+        max_size=get_settings().APP_LOGIN_RATE_LIMIT_SIZE
+    )
+
+
+# 토큰을 검증할 때마다 실행되는 조회는 statement를 미리 만들어 두고 값만 바꿔 실행한다.
+user_token_epoch_select = select(User.token_epoch).where(
+    User.id == bindparam("user_id")
+)
+access_token_blacklist_select = select(JWTAccessTokenBlackList.user_id).where(
+    JWTAccessTokenBlackList.user_id == bindparam("user_id"),
+    JWTAccessTokenBlackList.access_token == bindparam("access_token"),
+)
+refresh_token_select = select(JWTRefreshTokenList).where(
+    JWTRefreshTokenList.user_id == bindparam("user_id")
+)
+
+
+def decode_token(token: str):
+    payload = jwt_decode_cache.get(token)
+
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        jwt_decode_cache.put(token, payload)
+
+    return payload
+
+
+def get_unverified_token_claims(token: str | None):
+    if not token:
+        return {}
+
+    try:
+        return jwt.get_unverified_claims(token)
+    except JWTError:
+        return {}
+
+
+def load_access_token_revocation_cache(data_base: data_base_dependency):
+    with access_token_revocation_cache.lock:
+        if access_token_revocation_cache.is_loaded:
+            return
+
+        for values in (
+            data_base.query(JWTAccessTokenBlackList)
+            .filter(JWTAccessTokenBlackList.expired_date > datetime.now())
+            .with_entities(JWTAccessTokenBlackList.access_token)
+        ):
+            claims = get_unverified_token_claims(values[0])
+            access_token_revocation_cache.add(claims.get("uuid"), claims.get("exp"))
+
+        access_token_revocation_cache.is_loaded = True
+
+
+def is_access_token_revoked(
+    data_base: data_base_dependency,
+    user_id: int,
+    token: str,
+    token_id: str | None,
+):
+    if not access_token_revocation_cache.is_loaded:
+        load_access_token_revocation_cache(data_base=data_base)
+
+    is_revoked = access_token_revocation_cache.contains(token_id)
+
+    # 공유 메모리가 가득 찬 경우에는 DB를 조회한다.
+    if is_revoked is None:
+        is_revoked = (
+            data_base.scalar(
+                access_token_blacklist_select,
+                {"user_id": user_id, "access_token": token},
+            )
+            is not None
+        )
+
+    return is_revoked
+
+
 def ban_access_token(
     data_base: data_base_dependency,
     user_id: int,
     user_access_token: str,
 ):
-    user_old_access_token = (
-        data_base.query(JWTAccessTokenBlackList)
-        .filter_by(
-            user_id=user_id,
-            access_token=user_access_token,
-        )
-        .first()
+    # commit은 호출한 쪽에서 한 번만 진행한다.
+    user_old_access_token = data_base.get(
+        JWTAccessTokenBlackList, (user_id, user_access_token)
     )
 
     if not user_old_access_token:
@@ -73,13 +229,53 @@ def ban_access_token(
         )
 
         data_base.add(user_old_access_token)
-        data_base.commit()
 
+    # rollback되면 DB에는 없는 폐기 정보가 캐시에만 남으므로 commit 후에 추가한다.
+    claims = get_unverified_token_claims(user_access_token)
+    run_after_commit(
+        data_base,
+        lambda: access_token_revocation_cache.add(claims.get("uuid"), claims.get("exp")),
+    )
 
-def generate_refresh_token(
-    data_base: data_base_dependency,
-    user_id: int,
+
+def get_user_token_epoch(
+    data_base: data_base_dependency, user_id: int, expected_token_epoch: int = 0
 ):
+    token_epoch = user_token_epoch_cache.get(user_id)
+
+    # 다른 worker에서 증가됐거나 DB가 복원돼 캐시가 틀렸을 수 있으므로 토큰과 다르면 DB에서 다시 읽는다.
+    if (token_epoch is None) or (token_epoch != expected_token_epoch):
+        generation = user_token_epoch_cache.get_generation()
+        token_epoch = data_base.scalar(user_token_epoch_select, {"user_id": user_id})
+
+        if token_epoch is not None:
+            user_token_epoch_cache.set(user_id, token_epoch, generation)
+
+    return token_epoch
+
+
+def bump_user_token_epoch(data_base: data_base_dependency, user: User):
+    token_epoch = user.token_epoch
+
+    # 동시에 갱신된 경우 두 요청 모두 같은 epoch을 발급하지 않도록 비교 후 증가시킨다.
+    is_updated = (
+        data_base.query(User)
+        .filter_by(id=user.id, token_epoch=token_epoch)
+        .update(
+            {User.token_epoch: token_epoch + 1, User.update_date: User.update_date},
+            synchronize_session=False,
+        )
+    )
+    if not is_updated:
+        raise HTTPException(**http_exception_params["not_verified_token"])
+
+    set_committed_value(user, "token_epoch", token_epoch + 1)
+
+    # commit 이전에 캐시를 비우면 다른 worker가 이전 epoch을 다시 캐시할 수 있다.
+    run_after_commit(data_base, lambda: user_token_epoch_cache.invalidate(user.id))
+
+
+def generate_refresh_token(user_id: int):
     data = {
         "sub": "refresh_token",
         "exp": datetime.utcnow() + timedelta(days=1),
@@ -88,49 +284,51 @@ def generate_refresh_token(
         "uuid": str(uuid.uuid4()),
     }
 
-    refresh_token = jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
 
-    user_refresh_token = (
-        data_base.query(JWTRefreshTokenList).filter_by(user_id=user_id).first()
-    )
 
-    if not user_refresh_token:
-        user_refresh_token = JWTRefreshTokenList(
-            user_id=user_id,
-            refresh_token=refresh_token,
-            expired_date=datetime.now() + timedelta(days=1),
-        )
-        data_base.add(user_refresh_token)
-        data_base.commit()
+def get_user_board_scopes(data_base: data_base_dependency, user_id: int):
+    scopes = user_board_scope_cache.get(user_id)
 
-    else:
-        if user_refresh_token.access_token:
-            ban_access_token(
-                data_base=data_base,
-                user_id=user_id,
-                user_access_token=user_refresh_token.access_token,
+    if scopes is None:
+        generation = user_board_scope_cache.get_generation()
+        explicit_board_ids = (
+            data_base.query(UserPermissionTable)
+            .filter_by(user_id=user_id)
+            .with_entities(UserPermissionTable.board_id)
+        )
+        # 규칙으로 부여된 권한에서 제외된 user는 deny table에 저장된다.
+        implicit_board_ids = (
+            data_base.query(Board)
+            .filter(
+                Board.is_permission_implicit == True,
+                Board.permission_verified_user_id_range >= user_id,
+                ~exists().where(
+                    UserPermissionDenyTable.board_id == Board.id,
+                    UserPermissionDenyTable.user_id == user_id,
+                ),
             )
+            .with_entities(Board.id)
+        )
+        scopes = frozenset(
+            values[0] for values in explicit_board_ids.union(implicit_board_ids)
+        )
+        user_board_scope_cache.set(user_id, scopes, generation)
 
-        user_refresh_token.refresh_token = refresh_token
-        user_refresh_token.expired_date = datetime.now() + timedelta(days=1)
-        data_base.add(user_refresh_token)
-        data_base.commit()
+    return scopes
 
-    return refresh_token
 
+def invalidate_user_board_scopes(data_base: data_base_dependency, user_id: int = None):
+    # commit 이전에 캐시를 비우면 다른 요청이 이전 권한을 다시 캐시할 수 있다.
+    if user_id is None:
+        run_after_commit(data_base, user_board_scope_cache.clear)
+    else:
+        run_after_commit(
+            data_base, lambda: user_board_scope_cache.invalidate(user_id)
+        )
 
-def generate_access_token(
-    data_base: data_base_dependency,
-    user_id: int,
-):
-    user = data_base.query(User).filter_by(id=user_id).first()
-    board_scopes = [
-        values[0]
-        for values in data_base.query(UserPermissionTable)
-        .filter_by(user_id=user_id)
-        .with_entities(UserPermissionTable.board_id)
-    ]
 
+def generate_access_token(data_base: data_base_dependency, user: User):
     data = {
         "sub": "access_token",
         "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
@@ -138,20 +336,16 @@ def generate_access_token(
         "user_name": user.name,
         "user_id": user.id,
         "is_admin": user.is_superuser,
-        "scopes": board_scopes,
+        "scopes": sorted(get_user_board_scopes(data_base=data_base, user_id=user.id)),
+        "token_epoch": user.token_epoch,
         "uuid": str(uuid.uuid4()),
     }
 
-    access_token = jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
 
-    return access_token
 
-
-def generate_user_tokens(
-    form_data: OAuth2PasswordRequestForm,
-    data_base: data_base_dependency,
-):
-    user = data_base.query(User).filter_by(name=form_data.username).first()
+def get_login_user(data_base: data_base_dependency, name: str):
+    user = data_base.query(User).filter_by(name=name).first()
 
     if not user:
         raise HTTPException(**http_exception_params["not_user"])
@@ -159,20 +353,28 @@ def generate_user_tokens(
     if user.is_banned:
         raise HTTPException(**http_exception_params["banned"])
 
-    if not get_password_context().verify(
-        (form_data.password + user.password_salt), user.password
-    ):
-        raise HTTPException(**http_exception_params["not_verified_password"])
+    return user
 
-    refresh_token = generate_refresh_token(data_base=data_base, user_id=user.id)
-    access_token = generate_access_token(data_base=data_base, user_id=user.id)
 
-    user_refresh_token = (
-        data_base.query(JWTRefreshTokenList).filter_by(user_id=user.id).first()
-    )
+def issue_user_tokens(data_base: data_base_dependency, user: User):
+    refresh_token = generate_refresh_token(user_id=user.id)
+    access_token = generate_access_token(data_base=data_base, user=user)
+
+    user_refresh_token = data_base.get(JWTRefreshTokenList, user.id)
+
+    if not user_refresh_token:
+        user_refresh_token = JWTRefreshTokenList(user_id=user.id)
+    elif user_refresh_token.access_token:
+        ban_access_token(
+            data_base=data_base,
+            user_id=user.id,
+            user_access_token=user_refresh_token.access_token,
+        )
+
+    user_refresh_token.refresh_token = refresh_token
     user_refresh_token.access_token = access_token
+    user_refresh_token.expired_date = datetime.now() + timedelta(days=1)
     data_base.add(user_refresh_token)
-    data_base.commit()
 
     return {
         "access_token": access_token,
@@ -181,26 +383,83 @@ def generate_user_tokens(
     }
 
 
+def get_login_rate_limit_rules(name: str, client_host: str | None):
+    rules = [
+        (
+            f"user:{name}",
+            get_settings().APP_LOGIN_RATE_LIMIT_USER_BURST,
+            get_settings().APP_LOGIN_RATE_LIMIT_USER_PER_MINUTE / 60,
+        )
+    ]
+
+    if client_host:
+        rules.append(
+            (
+                f"ip:{client_host}",
+                get_settings().APP_LOGIN_RATE_LIMIT_IP_BURST,
+                get_settings().APP_LOGIN_RATE_LIMIT_IP_PER_MINUTE / 60,
+            )
+        )
+
+    return rules
+
+
+async def generate_user_tokens(
+    form_data: OAuth2PasswordRequestForm,
+    data_base: data_base_dependency,
+    client_host: str | None = None,
+):
+    # bcrypt 계산 전에 token을 먼저 차감하고 로그인에 성공하면 돌려준다.
+    rate_limit_rules = get_login_rate_limit_rules(form_data.username, client_host)
+    if not login_rate_limiter.acquire(rate_limit_rules):
+        raise HTTPException(**http_exception_params["too_many_login_attempts"])
+
+    user = await run_in_threadpool(get_login_user, data_base, form_data.username)
+
+    try:
+        is_verified = await verify_password_async(
+            form_data.password, user.password_salt, user.password
+        )
+    except HTTPException:
+        # 서버가 바빠 비밀번호를 확인하지 못했으므로 차감한 token을 돌려준다.
+        login_rate_limiter.release(rate_limit_rules)
+        raise
+
+    if not is_verified:
+        raise HTTPException(**http_exception_params["not_verified_password"])
+
+    login_rate_limiter.release(rate_limit_rules)
+
+    # epoch 갱신과 refresh token 저장을 commit과 한 번에 실행해 write lock을 await 사이에 잡고 있지 않는다.
+    return await run_in_threadpool(run_and_commit, issue_user_tokens, data_base, user)
+
+
 def validate_and_decode_user_access_token(
-    data_base: data_base_dependency, token: token_dependency
+    data_base: read_data_base_dependency, token: token_dependency
 ):
     credentials_exception = HTTPException(**http_exception_params["not_verified_token"])
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_name: str = payload.get("user_name")
         user_id: int = payload.get("user_id")
 
-        access_token_blacklist = [
-            values[0]
-            for values in data_base.query(JWTAccessTokenBlackList)
-            .filter_by(user_id=user_id)
-            .with_entities(JWTAccessTokenBlackList.access_token)
-        ]
-
         if (
             (user_name is None)
             or (user_id is None)
-            or (token in access_token_blacklist)
+            or is_access_token_revoked(
+                data_base=data_base,
+                user_id=user_id,
+                token=token,
+                token_id=payload.get("uuid"),
+            )
+            or (
+                payload.get("token_epoch", 0)
+                != get_user_token_epoch(
+                    data_base=data_base,
+                    user_id=user_id,
+                    expected_token_epoch=payload.get("token_epoch", 0),
+                )
+            )
         ):
             raise credentials_exception
     except JWTError:
@@ -210,7 +469,7 @@ def validate_and_decode_user_access_token(
 
 
 def validate_and_decode_admin_access_token(
-    data_base: data_base_dependency, token: token_dependency
+    data_base: read_data_base_dependency, token: token_dependency
 ):
     payload = validate_and_decode_user_access_token(data_base=data_base, token=token)
     if not payload.get("is_admin"):
@@ -231,13 +490,11 @@ def validate_and_decode_refresh_token(
         )
         token = token.split()[-1]
 
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: int = payload.get("user_id")
-        user_refresh_token = (
-            data_base.query(JWTRefreshTokenList)
-            .filter_by(user_id=payload.get("user_id"))
-            .first()
-        )
+        user_refresh_token = data_base.scalars(
+            refresh_token_select, {"user_id": user_id}
+        ).first()
         if (
             (user_id is None)
             or (user_refresh_token is None)
@@ -250,7 +507,22 @@ def validate_and_decode_refresh_token(
     return payload
 
 
+async def validate_and_decode_user_access_token_async(
+    data_base: async_data_base_dependency, token: token_dependency
+):
+    # 대부분 캐시에서 처리되므로 threadpool 대신 async session 위에서 그대로 실행한다.
+    payload = await data_base.run_sync(validate_and_decode_user_access_token, token)
+
+    # websocket처럼 오래 유지되는 요청이 읽기 transaction을 계속 잡고 있지 않도록 연결을 반납한다.
+    await data_base.close()
+
+    return payload
+
+
 current_user_payload = Annotated[dict, Depends(validate_and_decode_user_access_token)]
+current_user_payload_async = Annotated[
+    dict, Depends(validate_and_decode_user_access_token_async)
+]
 current_admin_payload = Annotated[dict, Depends(validate_and_decode_admin_access_token)]
 current_refresh_token_payload = Annotated[
     dict, Depends(validate_and_decode_refresh_token)
@@ -261,22 +533,16 @@ def refresh_access_token(
     data_base: data_base_dependency,
     refresh_token: current_refresh_token_payload,
 ):
-    user_refresh_token = (
-        data_base.query(JWTRefreshTokenList)
-        .filter_by(user_id=refresh_token.get("user_id"))
-        .first()
-    )
-    access_token = generate_access_token(
-        data_base=data_base, user_id=user_refresh_token.user_id
-    )
-    ban_access_token(
-        data_base=data_base,
-        user_id=refresh_token.get("user_id"),
-        user_access_token=user_refresh_token.access_token,
+    user = data_base.get(User, refresh_token.get("user_id"))
+
+    bump_user_token_epoch(data_base=data_base, user=user)
+    access_token = generate_access_token(data_base=data_base, user=user)
+
+    # refresh token row는 validate_and_decode_refresh_token에서 이미 확인했다.
+    data_base.query(JWTRefreshTokenList).filter_by(user_id=user.id).update(
+        {JWTRefreshTokenList.access_token: access_token},
+        synchronize_session=False,
     )
-    user_refresh_token.access_token = access_token
-    data_base.add(user_refresh_token)
-    data_base.commit()
 
     return {
         "access_token": access_token,
@@ -288,21 +554,28 @@ def delete_refresh_token(
     data_base: data_base_dependency,
     user_id: int,
 ):
-    user_refresh_token = (
-        data_base.query(JWTRefreshTokenList).filter_by(user_id=user_id).first()
-    )
+    user_refresh_token = data_base.get(JWTRefreshTokenList, user_id)
+
+    # 만료된 refresh token row가 이미 정리된 경우
+    if not user_refresh_token:
+        return
+
     ban_access_token(
         data_base=data_base,
         user_id=user_id,
         user_access_token=user_refresh_token.access_token,
     )
     data_base.delete(user_refresh_token)
-    data_base.commit()
 
 
-def scope_checker(token: current_user_payload, target_scopes: list):
-    token_scopes_set = set(token.get("scopes", []))
+def scope_checker(
+    data_base: data_base_dependency, token: current_user_payload, target_scopes: list
+):
+    # 토큰 재발급 없이 권한 변경이 반영되도록 토큰의 scopes 대신 캐시된 권한을 확인한다.
+    user_scopes_set = get_user_board_scopes(
+        data_base=data_base, user_id=token.get("user_id")
+    )
     target_scopes_set = set(target_scopes)
 
-    if not target_scopes_set.issubset(token_scopes_set):
+    if not target_scopes_set.issubset(user_scopes_set):
         raise HTTPException(**http_exception_params["scopes_not_matched"])
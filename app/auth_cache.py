@@ -0,0 +1,483 @@
+import contextlib
+import hashlib
+import heapq
+import mmap
+from collections import OrderedDict
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 fcntl을 지원하지 않는 환경
+    fcntl = None
+
+
+def is_shared_memory_available():
+    return fcntl is not None
+
+
+class AccessTokenRevocationCache:
+    def __init__(self):
+        # token uuid -> 토큰 만료 시각(exp, unix timestamp)
+        self.revoked_tokens: dict[str, float] = dict()
+        self.expire_heap: list[tuple[float, str]] = []
+        self.lock = threading.RLock()
+        self.is_loaded = False
+
+    def add(self, token_id: str, expire_timestamp: float):
+        if token_id is None or expire_timestamp is None:
+            return
+
+        with self.lock:
+            self.evict_expired()
+            if expire_timestamp <= time.time():
+                return
+
+            self.revoked_tokens[token_id] = expire_timestamp
+            heapq.heappush(self.expire_heap, (expire_timestamp, token_id))
+
+    def contains(self, token_id: str) -> bool | None:
+        expire_timestamp = self.revoked_tokens.get(token_id)
+
+        if expire_timestamp is None:
+            return False
+
+        if expire_timestamp <= time.time():
+            with self.lock:
+                self.evict_expired()
+            return False
+
+        return True
+
+    def evict_expired(self):
+        # lock을 잡은 상태에서 호출한다.
+        now = time.time()
+        while self.expire_heap and self.expire_heap[0][0] <= now:
+            expire_timestamp, token_id = heapq.heappop(self.expire_heap)
+            if self.revoked_tokens.get(token_id) == expire_timestamp:
+                self.revoked_tokens.pop(token_id)
+
+    def clear(self):
+        with self.lock:
+            self.revoked_tokens.clear()
+            self.expire_heap.clear()
+            self.is_loaded = False
+
+    def __len__(self):
+        return len(self.revoked_tokens)
+
+
+class UserTTLCache:
+    def __init__(self, expire_seconds: float):
+        # user_id -> (캐시된 값, 캐시 만료 시각)
+        self.values: dict[int, tuple[object, float]] = dict()
+        self.expire_seconds = expire_seconds
+        self.generation = 0
+        self.lock = threading.RLock()
+
+    def get(self, user_id: int):
+        value = self.values.get(user_id)
+
+        if value is None:
+            return None
+
+        cached_value, expire_timestamp = value
+        if expire_timestamp <= time.time():
+            with self.lock:
+                self.values.pop(user_id, None)
+            return None
+
+        return cached_value
+
+    def get_generation(self) -> int:
+        return self.generation
+
+    def set(self, user_id: int, cached_value, generation: int):
+        with self.lock:
+            # DB 조회 도중 무효화가 일어났다면 조회한 값이 오래된 값일 수 있다.
+            if generation != self.generation:
+                return
+
+            self.values[user_id] = (
+                cached_value,
+                time.time() + self.expire_seconds,
+            )
+
+    def invalidate(self, user_id: int):
+        with self.lock:
+            self.generation += 1
+            self.values.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.values.clear()
+
+
+class UserTokenEpochCache(UserTTLCache):
+    pass
+
+
+class UserBoardScopeCache(UserTTLCache):
+    # user_id -> 접근 가능한 board_id의 frozenset
+    pass
+
+
+class JWTDecodeCache:
+    def __init__(self, max_size: int):
+        # sha256(token) -> (검증된 payload, 토큰 만료 시각)
+        self.payloads: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self.get_key(token)
+
+        with self.lock:
+            value = self.payloads.get(key)
+
+            if (value is None) or (value[1] <= time.time()):
+                if value is not None:
+                    self.payloads.pop(key)
+                self.misses += 1
+                return None
+
+            self.payloads.move_to_end(key)
+            self.hits += 1
+
+        return dict(value[0])
+
+    def put(self, token: str, payload: dict):
+        expire_timestamp = payload.get("exp")
+
+        if (self.max_size <= 0) or (expire_timestamp is None):
+            return
+
+        key = self.get_key(token)
+
+        with self.lock:
+            self.payloads[key] = (dict(payload), expire_timestamp)
+            self.payloads.move_to_end(key)
+
+            while len(self.payloads) > self.max_size:
+                self.payloads.popitem(last=False)
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            "size": len(self.payloads),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / requests) if requests else 0.0,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.payloads.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class SharedMemoryFile:
+    # 같은 host의 여러 worker process가 mmap으로 공유하는 파일
+    # header : magic, slot_count, sequence, used_slots, is_overflowed, is_loaded, generation
+    magic = b"SHMFILE0"
+    slot_format = "<Q"
+    header_size = 64
+
+    SEQUENCE = 16
+    USED_SLOTS = 24
+    IS_OVERFLOWED = 32
+    IS_LOADED = 40
+    GENERATION = 48
+
+    def __init__(self, path: str, slot_count: int):
+        self.path = path
+        self.slot_count = slot_count
+        self.slot_size = struct.calcsize(self.slot_format)
+        self.file_size = self.header_size + self.slot_size * slot_count
+        self.file_descriptor = None
+        self.memory = None
+
+        self.open()
+        os.register_at_fork(after_in_child=self.open)
+
+    def open(self):
+        # fork 이후에는 flock이 부모 process와 공유되므로 파일을 다시 연다.
+        if self.memory is not None:
+            self.memory.close()
+        if self.file_descriptor is not None:
+            os.close(self.file_descriptor)
+
+        self.thread_lock = threading.RLock()
+        self.lock_depth = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.file_descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.file_descriptor, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.file_descriptor).st_size != self.file_size:
+                os.ftruncate(self.file_descriptor, self.file_size)
+
+            self.memory = mmap.mmap(self.file_descriptor, self.file_size)
+
+            magic, slot_count = struct.unpack_from("<8sQ", self.memory, 0)
+            if (magic != self.magic) or (slot_count != self.slot_count):
+                self.memory[:] = bytes(self.file_size)
+                struct.pack_into("<8sQ", self.memory, 0, self.magic, self.slot_count)
+        finally:
+            fcntl.flock(self.file_descriptor, fcntl.LOCK_UN)
+
+    @property
+    def lock(self):
+        return self
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.lock_depth == 0:
+            fcntl.flock(self.file_descriptor, fcntl.LOCK_EX)
+        self.lock_depth += 1
+        return self
+
+    def __exit__(self, *args):
+        self.lock_depth -= 1
+        if self.lock_depth == 0:
+            fcntl.flock(self.file_descriptor, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+    def get_header(self, offset: int) -> int:
+        return struct.unpack_from("<Q", self.memory, offset)[0]
+
+    def set_header(self, offset: int, value: int):
+        struct.pack_into("<Q", self.memory, offset, value)
+
+    def get_slot(self, index: int):
+        return struct.unpack_from(
+            self.slot_format, self.memory, self.header_size + self.slot_size * index
+        )
+
+    def set_slot(self, index: int, *values):
+        struct.pack_into(
+            self.slot_format,
+            self.memory,
+            self.header_size + self.slot_size * index,
+            *values,
+        )
+
+    def clear_slots(self):
+        self.memory[self.header_size :] = bytes(self.slot_size * self.slot_count)
+
+    @contextlib.contextmanager
+    def write_section(self):
+        # seqlock : 쓰는 동안 sequence를 홀수로 두어 reader가 다시 읽도록 한다.
+        with self.lock:
+            sequence = self.get_header(self.SEQUENCE)
+            self.set_header(self.SEQUENCE, sequence + 1)
+            try:
+                yield
+            finally:
+                self.set_header(self.SEQUENCE, sequence + 2)
+
+    def read_section(self, read_function):
+        for _ in range(64):
+            sequence = self.get_header(self.SEQUENCE)
+            if sequence % 2 == 0:
+                result = read_function()
+                if self.get_header(self.SEQUENCE) == sequence:
+                    return result
+
+        with self.lock:
+            return read_function()
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self.get_header(self.IS_LOADED))
+
+    @is_loaded.setter
+    def is_loaded(self, value: bool):
+        with self.write_section():
+            self.set_header(self.IS_LOADED, int(value))
+
+
+class SharedAccessTokenRevocationSet(SharedMemoryFile):
+    # slot : token uuid의 64bit hash, 토큰 만료 시각(exp)
+    magic = b"ATRSET01"
+    slot_format = "<Qd"
+    max_load_factor = 0.5
+
+    def __init__(self, path: str, slot_count: int):
+        super().__init__(path=path, slot_count=slot_count)
+        self.max_used_slots = int(self.slot_count * self.max_load_factor)
+
+    @staticmethod
+    def get_key(token_id: str) -> int:
+        digest = hashlib.blake2b(token_id.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def add(self, token_id: str, expire_timestamp: float):
+        if token_id is None or expire_timestamp is None:
+            return
+        if expire_timestamp <= time.time():
+            return
+
+        key = self.get_key(token_id)
+
+        with self.write_section():
+            if self.get_header(self.IS_OVERFLOWED) or (
+                self.get_header(self.USED_SLOTS) >= self.max_used_slots
+            ):
+                self.rebuild()
+                if self.get_header(self.IS_OVERFLOWED):
+                    return
+
+            self.insert(key, expire_timestamp)
+
+    def insert(self, key: int, expire_timestamp: float):
+        # write_section 안에서 호출한다. 만료된 slot은 재사용한다.
+        now = time.time()
+        index = key % self.slot_count
+        reusable_index = None
+
+        for _ in range(self.slot_count):
+            slot_key, slot_expire_timestamp = self.get_slot(index)
+
+            if slot_key == key:
+                self.set_slot(
+                    index, key, max(expire_timestamp, slot_expire_timestamp)
+                )
+                return
+            if slot_key == 0:
+                break
+            if (reusable_index is None) and (slot_expire_timestamp <= now):
+                reusable_index = index
+
+            index = (index + 1) % self.slot_count
+        else:
+            if reusable_index is None:
+                self.set_header(self.IS_OVERFLOWED, 1)
+                return
+
+        if reusable_index is None:
+            self.set_header(self.USED_SLOTS, self.get_header(self.USED_SLOTS) + 1)
+            reusable_index = index
+
+        self.set_slot(reusable_index, key, expire_timestamp)
+
+    def rebuild(self):
+        # 만료된 slot을 제거하고 probe 길이를 다시 짧게 만든다.
+        now = time.time()
+        alive_slots = [
+            (slot_key, slot_expire_timestamp)
+            for slot_key, slot_expire_timestamp in (
+                self.get_slot(index) for index in range(self.slot_count)
+            )
+            if slot_key and (slot_expire_timestamp > now)
+        ]
+
+        self.clear_slots()
+        self.set_header(self.USED_SLOTS, 0)
+        self.set_header(self.IS_OVERFLOWED, 0)
+
+        if len(alive_slots) >= self.max_used_slots:
+            # 공간이 부족하면 DB를 조회하도록 표시한다.
+            alive_slots = alive_slots[: self.max_used_slots]
+            self.set_header(self.IS_OVERFLOWED, 1)
+
+        for slot_key, slot_expire_timestamp in alive_slots:
+            self.insert(slot_key, slot_expire_timestamp)
+
+    def contains(self, token_id: str) -> bool | None:
+        if token_id is None:
+            return False
+
+        key = self.get_key(token_id)
+
+        def find():
+            if self.get_header(self.IS_OVERFLOWED):
+                return None
+
+            index = key % self.slot_count
+            for _ in range(self.slot_count):
+                slot_key, slot_expire_timestamp = self.get_slot(index)
+
+                if slot_key == key:
+                    return slot_expire_timestamp > time.time()
+                if slot_key == 0:
+                    return False
+
+                index = (index + 1) % self.slot_count
+            return False
+
+        return self.read_section(find)
+
+    def clear(self):
+        with self.write_section():
+            self.clear_slots()
+            self.set_header(self.USED_SLOTS, 0)
+            self.set_header(self.IS_OVERFLOWED, 0)
+            self.set_header(self.IS_LOADED, 0)
+
+    def __len__(self):
+        return self.get_header(self.USED_SLOTS)
+
+
+class SharedUserTokenEpochCache(SharedMemoryFile):
+    # slot index : user_id, slot : token_epoch + 1 (0은 캐시 없음), 캐시 만료 시각
+    magic = b"UTEPOCH2"
+    slot_format = "<Id"
+
+    def __init__(self, path: str, slot_count: int, expire_seconds: float):
+        self.expire_seconds = expire_seconds
+        super().__init__(path=path, slot_count=slot_count)
+
+    def open(self):
+        super().open()
+        # DB가 다시 만들어지거나 복원됐을 수 있으므로 이전 실행에서 남은 epoch은 사용하지 않는다.
+        self.clear()
+
+    def get(self, user_id: int) -> int | None:
+        if not (0 < user_id < self.slot_count):
+            return None
+
+        value, expire_timestamp = self.read_section(lambda: self.get_slot(user_id))
+        if (not value) or (expire_timestamp <= time.time()):
+            return None
+
+        return value - 1
+
+    def get_generation(self) -> int:
+        return self.get_header(self.GENERATION)
+
+    def set(self, user_id: int, token_epoch: int, generation: int):
+        if not (0 < user_id < self.slot_count):
+            return
+
+        with self.write_section():
+            # DB 조회 도중 다른 process에서 무효화가 일어났다면 저장하지 않는다.
+            if generation != self.get_header(self.GENERATION):
+                return
+
+            self.set_slot(user_id, token_epoch + 1, time.time() + self.expire_seconds)
+
+    def invalidate(self, user_id: int):
+        with self.write_section():
+            self.set_header(self.GENERATION, self.get_header(self.GENERATION) + 1)
+            if 0 < user_id < self.slot_count:
+                self.set_slot(user_id, 0, 0.0)
+
+    def clear(self):
+        with self.write_section():
+            self.set_header(self.GENERATION, self.get_header(self.GENERATION) + 1)
+            self.clear_slots()
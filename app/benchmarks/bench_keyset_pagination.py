@@ -0,0 +1,70 @@
+# 게시글 목록의 깊은 페이지 조회 시간을 skip(OFFSET)과 cursor 방식으로 비교한다.
+# 실행 : app 폴더에서 python -m benchmarks.bench_keyset_pagination [게시글 수]
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from database import Base
+from models import Post
+from pagination import paginate, encode_cursor
+from benchmarks.bench_listing_indexes import insert_posts, board_count
+
+
+page_size = 10
+order_columns = [Post.create_date, Post.id]
+
+
+def get_statement():
+    return (
+        select(Post)
+        .filter_by(board_id=1)
+        .order_by(Post.create_date.desc(), Post.id.desc())
+    )
+
+
+def measure(data_base: Session, skip: int, cursor: str | None, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        statement = paginate(get_statement(), order_columns, skip, page_size, cursor, True)
+        data_base.scalars(statement).all()
+        data_base.expunge_all()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main(rows: int):
+    directory = tempfile.mkdtemp(prefix="bench_keyset_")
+    engine = create_engine(f"sqlite:///{directory}/bench.sqlite")
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        insert_posts(connection, 0, rows)
+
+    page_count = rows // board_count // page_size
+    pages = sorted({1, 10, 100, 1000, 10000, page_count} & set(range(1, page_count + 1)))
+
+    print(f"{'page':>8}{'skip ms':>12}{'cursor ms':>12}")
+
+    with Session(engine) as data_base:
+        for page in pages:
+            skip = (page - 1) * page_size
+
+            # 앞 페이지의 마지막 row로 cursor를 만든다. (측정에는 포함하지 않는다.)
+            cursor = None
+            if skip:
+                previous_row = data_base.scalars(
+                    get_statement().offset(skip - 1).limit(1)
+                ).one()
+                cursor = encode_cursor(previous_row, order_columns)
+
+            skip_milliseconds = measure(data_base, skip, None, 20)
+            cursor_milliseconds = measure(data_base, 0, cursor, 20)
+            print(f"{page:>8}{skip_milliseconds:>12.3f}{cursor_milliseconds:>12.3f}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,81 @@
+# 게시글 수가 늘어날 때 목록 첫 페이지 조회 시간을 index 사용 여부별로 비교한다.
+# 실행 : app 폴더에서 python -m benchmarks.bench_listing_indexes [최대 게시글 수]
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+
+from database import Base
+from models import Post
+
+
+board_count = 10
+page_size = 10
+
+# get_posts와 같은 조건. NOT INDEXED는 index가 없던 때의 실행 계획을 재현한다.
+page_sql = (
+    "SELECT * FROM post {hint} WHERE board_id = ? "
+    "ORDER BY create_date DESC, id DESC LIMIT ? OFFSET 0"
+)
+
+
+def insert_posts(connection, start: int, stop: int):
+    base_date = datetime(2024, 1, 1)
+    batch_size = 50000
+
+    for batch_start in range(start, stop, batch_size):
+        connection.execute(
+            insert(Post),
+            [
+                {
+                    "user_id": 1,
+                    "board_id": index % board_count + 1,
+                    "name": f"post{index}",
+                    "content": "bench",
+                    "create_date": base_date + timedelta(seconds=index),
+                }
+                for index in range(batch_start, min(batch_start + batch_size, stop))
+            ],
+        )
+
+
+def measure(connection, hint: str, iterations: int):
+    sql = page_sql.format(hint=hint)
+    start = time.perf_counter()
+    for iteration in range(iterations):
+        connection.exec_driver_sql(
+            sql, (iteration % board_count + 1, page_size)
+        ).all()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main(max_rows: int):
+    directory = tempfile.mkdtemp(prefix="bench_index_")
+    engine = create_engine(f"sqlite:///{directory}/bench.sqlite")
+    Base.metadata.create_all(engine)
+
+    print(f"{'rows':>10}{'indexed ms':>14}{'full scan ms':>14}")
+
+    rows = 0
+    size = 10000
+    while rows < max_rows:
+        size = min(size, max_rows)
+        with engine.begin() as connection:
+            insert_posts(connection, rows, size)
+        rows = size
+
+        with engine.connect() as connection:
+            connection.exec_driver_sql("ANALYZE")
+            indexed = measure(connection, "", 100)
+            full_scan = measure(connection, "NOT INDEXED", 5)
+
+        print(f"{rows:>10}{indexed:>14.3f}{full_scan:>14.3f}")
+        size *= 10
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
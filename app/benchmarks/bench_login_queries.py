@@ -0,0 +1,92 @@
+# 로그인/토큰 갱신 1회당 실행되는 SQL 문과 commit 횟수를 측정한다.
+# 실행 : app 폴더에서 python -m benchmarks.bench_login_queries
+import os
+import sys
+import tempfile
+import time
+
+benchmark_directory = tempfile.mkdtemp(prefix="bench_login_")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{benchmark_directory}/bench.sqlite"
+os.environ["APP_TOKEN_REVOCATION_MMAP_PATH"] = f"{benchmark_directory}/revocation.mmap"
+os.environ["APP_TOKEN_EPOCH_MMAP_PATH"] = f"{benchmark_directory}/epoch.mmap"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from main import create_app
+import database
+from database import Base
+import models
+import v1_url
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def before_cursor_execute(self, *args):
+        self.statements += 1
+
+    def commit(self, *args):
+        self.commits += 1
+
+
+def url(path: str):
+    return "".join([v1_url.API_V1_ROUTER_PREFIX, v1_url.USER_PREFIX, path])
+
+
+def main(iterations: int):
+    app = create_app()
+    engine = database.engine
+    Base.metadata.create_all(engine)
+
+    client = TestClient(app)
+    client.post(
+        url(v1_url.USER_CREATE_USER),
+        json={
+            "name": "benchuser",
+            "password1": "12345678aA!",
+            "password2": "12345678aA!",
+            "email": "benchuser@example.com",
+        },
+    )
+
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter.before_cursor_execute)
+    event.listen(engine, "commit", counter.commit)
+
+    results = {}
+    refresh_token = None
+
+    for name in ("login", "refresh"):
+        counter.statements = counter.commits = 0
+        started = time.perf_counter()
+
+        for _ in range(iterations):
+            if name == "login":
+                response = client.post(
+                    url(v1_url.USER_LOGIN_USER),
+                    data={"username": "benchuser", "password": "12345678aA!"},
+                )
+                refresh_token = response.cookies.get("refresh_token")
+            else:
+                response = client.post(
+                    url(v1_url.USER_REFRESH_USER),
+                    headers={"Authorization": f"Bearer {refresh_token}"},
+                )
+            assert response.status_code == 200, response.text
+
+        results[name] = (
+            counter.statements / iterations,
+            counter.commits / iterations,
+            (time.perf_counter() - started) * 1000 / iterations,
+        )
+
+    print(f"{'flow':<10}{'queries':>10}{'commits':>10}{'ms/call':>10}")
+    for name, (statements, commits, milliseconds) in results.items():
+        print(f"{name:<10}{statements:>10.1f}{commits:>10.1f}{milliseconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main(iterations=int(sys.argv[1]) if len(sys.argv) > 1 else 20)
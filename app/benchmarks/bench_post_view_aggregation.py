@@ -0,0 +1,88 @@
+# 쌓인 PostViewIncrement row를 조회수에 반영하는 시간을 row 단위 처리와 집합 연산으로 비교한다.
+# 실행 : app 폴더에서 python -m benchmarks.bench_post_view_aggregation [row 수]
+import os
+import sys
+import tempfile
+import time
+
+benchmark_directory = tempfile.mkdtemp(prefix="bench_view_aggregation_")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{benchmark_directory}/bench.sqlite"
+os.environ["SQLALCHEMY_DATABASE_BINDS"] = "{}"
+
+from sqlalchemy import insert
+
+import database
+from database import Base, get_data_base_for_decorator
+from models import Post, PostViewIncrement
+from domain.board.tasks import update_post_view_counts
+
+
+post_count = 1000
+
+
+def insert_increments(rows: int):
+    with database.engine.begin() as connection:
+        connection.execute(Post.__table__.delete())
+        connection.execute(
+            insert(Post),
+            [
+                {"user_id": 1, "board_id": 1, "name": "bench", "content": "bench"}
+                for _ in range(post_count)
+            ],
+        )
+        connection.execute(
+            insert(PostViewIncrement),
+            [{"post_id": row % post_count + 1} for row in range(rows)],
+        )
+
+
+def update_row_by_row():
+    # 이전 구현 : 모든 row를 읽어서 세고 게시글마다 UPDATE, row마다 DELETE한다.
+    with get_data_base_for_decorator() as data_base:
+        post_view_increments = data_base.query(PostViewIncrement).all()
+
+        post_view_counts = dict()
+        for post_view_increment in post_view_increments:
+            post_view_counts[post_view_increment.post_id] = (
+                post_view_counts.get(post_view_increment.post_id, 0) + 1
+            )
+
+        for post_id, count in post_view_counts.items():
+            data_base.query(Post).filter(Post.id == post_id).update(
+                {Post.number_of_view: Post.number_of_view + count},
+                synchronize_session=False,
+            )
+
+        for post_view_increment in post_view_increments:
+            data_base.delete(post_view_increment)
+
+        data_base.commit()
+
+
+def measure(function, rows: int):
+    insert_increments(rows)
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main(rows: int):
+    database.create_database_engines()
+    Base.metadata.create_all(database.engine)
+
+    row_by_row_seconds = measure(update_row_by_row, rows)
+    set_based_seconds = measure(lambda: update_post_view_counts(None), rows)
+
+    print(f"{'mode':<12}{'seconds':>12}{'rows/s':>14}")
+    print(
+        f"{'row by row':<12}{row_by_row_seconds:>12.3f}{rows / row_by_row_seconds:>14.1f}"
+    )
+    print(
+        f"{'set based':<12}{set_based_seconds:>12.3f}{rows / set_based_seconds:>14.1f}"
+    )
+
+    database.database_engine_shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,109 @@
+# 게시글 조회수 기록 방식별 처리량을 비교한다. (조회마다 row 저장 vs 메모리에서 세고 한 번에 반영)
+# 실행 : app 폴더에서 python -m benchmarks.bench_post_view_counter [조회 수]
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, set_sqlite_pragmas_on_connect
+from models import User, Board, Post, PostViewIncrement
+from view_counter import ShardedCounter
+from domain.board.board_crud import post_view_count_update
+
+
+thread_count = 4
+post_count = 100
+
+
+def setup(session_factory):
+    with session_factory() as data_base:
+        user = User(
+            name="bench", email="bench@example.com", password="", password_salt=""
+        )
+        board = Board(name="bench", information="bench")
+        data_base.add_all([user, board])
+        data_base.flush()
+        data_base.add_all(
+            [
+                Post(name="bench", user_id=user.id, board_id=board.id, content="bench")
+                for _ in range(post_count)
+            ]
+        )
+        data_base.commit()
+
+
+def record_increments(session_factory, views: int):
+    for view in range(views):
+        with session_factory() as data_base:
+            data_base.add(PostViewIncrement(post_id=view % post_count + 1))
+            data_base.commit()
+
+
+def record_counter(counter: ShardedCounter, views: int):
+    for view in range(views):
+        counter.add(view % post_count + 1)
+
+
+def flush_counter(session_factory, counter: ShardedCounter):
+    with session_factory() as data_base:
+        data_base.execute(
+            post_view_count_update,
+            [
+                {"post_id": post_id, "count": count}
+                for post_id, count in counter.drain().items()
+            ],
+        )
+        data_base.commit()
+
+
+def run_threads(function, *args):
+    threads = [
+        threading.Thread(target=function, args=args) for _ in range(thread_count)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main(views: int):
+    directory = tempfile.mkdtemp(prefix="bench_view_")
+    engine = create_engine(
+        f"sqlite:///{directory}/bench.sqlite",
+        connect_args={"check_same_thread": False},
+    )
+    set_sqlite_pragmas_on_connect(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autoflush=False, bind=engine)
+    setup(session_factory)
+
+    views_per_thread = views // thread_count
+    total_views = views_per_thread * thread_count
+
+    increment_seconds = run_threads(
+        record_increments, session_factory, views_per_thread
+    )
+
+    counter = ShardedCounter(16)
+    counter_seconds = run_threads(record_counter, counter, views_per_thread)
+    start = time.perf_counter()
+    flush_counter(session_factory, counter)
+    flush_milliseconds = (time.perf_counter() - start) * 1000
+
+    engine.dispose()
+
+    print(f"{'mode':<12}{'views/s':>14}{'flush ms':>12}")
+    print(f"{'increment':<12}{total_views / increment_seconds:>14.1f}{'-':>12}")
+    print(
+        f"{'counter':<12}{total_views / counter_seconds:>14.1f}"
+        f"{flush_milliseconds:>12.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
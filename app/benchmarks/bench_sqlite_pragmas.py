@@ -0,0 +1,94 @@
+# SQLite PRAGMA 설정별 쓰기/읽기 처리량을 비교한다.
+# 실행 : app 폴더에서 python -m benchmarks.bench_sqlite_pragmas [반복 횟수]
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, get_sqlite_pragmas, set_sqlite_pragmas_on_connect
+from models import User, Board, Post, PostViewIncrement
+
+
+profiles = {
+    # SQLite 기본값 : rollback journal, synchronous=FULL
+    "default": {},
+    "settings": get_sqlite_pragmas(),
+    "wal_off": {**get_sqlite_pragmas(), "synchronous": "OFF"},
+}
+
+
+def setup(session_factory):
+    with session_factory() as data_base:
+        user = User(name="bench", email="bench@example.com", password="", password_salt="")
+        board = Board(name="bench", information="bench")
+        data_base.add_all([user, board])
+        data_base.flush()
+        post = Post(name="bench", user_id=user.id, board_id=board.id, content="bench")
+        data_base.add(post)
+        data_base.commit()
+        return post.id
+
+
+def write(session_factory, post_id: int, iterations: int):
+    # 게시글 조회수 기록처럼 row 하나를 추가하고 바로 commit한다.
+    for _ in range(iterations):
+        with session_factory() as data_base:
+            data_base.add(PostViewIncrement(post_id=post_id))
+            data_base.commit()
+
+
+def read(session_factory, post_id: int, iterations: int):
+    for _ in range(iterations):
+        with session_factory() as data_base:
+            data_base.query(Post).filter_by(id=post_id).first()
+            data_base.query(PostViewIncrement).filter_by(post_id=post_id).count()
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def run_profile(name: str, pragmas: dict, iterations: int):
+    directory = tempfile.mkdtemp(prefix="bench_pragma_")
+    engine = create_engine(
+        f"sqlite:///{directory}/bench.sqlite",
+        connect_args={"check_same_thread": False},
+    )
+    set_sqlite_pragmas_on_connect(engine, pragmas)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autoflush=False, bind=engine)
+
+    post_id = setup(session_factory)
+
+    write_seconds = measure(write, session_factory, post_id, iterations)
+    read_seconds = measure(read, session_factory, post_id, iterations)
+
+    # 쓰기가 진행되는 동안 읽기가 얼마나 막히는지 확인한다.
+    writer = threading.Thread(target=write, args=(session_factory, post_id, iterations))
+    writer.start()
+    mixed_read_seconds = measure(read, session_factory, post_id, iterations)
+    writer.join()
+
+    engine.dispose()
+
+    print(
+        f"{name:<10}"
+        f"{iterations / write_seconds:>14.1f}"
+        f"{iterations / read_seconds:>14.1f}"
+        f"{iterations / mixed_read_seconds:>18.1f}"
+    )
+
+
+def main(iterations: int):
+    print(f"{'profile':<10}{'writes/s':>14}{'reads/s':>14}{'reads/s (mixed)':>18}")
+    for name, pragmas in profiles.items():
+        run_profile(name, pragmas, iterations)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
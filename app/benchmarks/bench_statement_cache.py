@@ -0,0 +1,120 @@
+# 자주 호출되는 조회 1회당 ORM 처리 시간을 query 작성 방식별로 비교한다.
+# post detail은 요청을 처리하는 get_post_detail_async와 같이 AsyncSession으로 실행한다. (query()는 없다.)
+# 실행 : app 폴더에서 python -m benchmarks.bench_statement_cache [반복 횟수]
+import asyncio
+import sys
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import User, Board, Post
+from auth import user_token_epoch_select
+from domain.board.board_crud import post_detail_select
+
+
+def setup(data_base: Session):
+    user = User(name="bench", email="bench@example.com", password="", password_salt="")
+    board = Board(name="bench", information="bench")
+    data_base.add_all([user, board])
+    data_base.flush()
+    post = Post(name="bench", user_id=user.id, board_id=board.id, content="bench")
+    data_base.add(post)
+    data_base.commit()
+    return user.id, post.id, board.id
+
+
+def measure(function, iterations: int):
+    # 처음 호출은 compile 비용이 들어가므로 측정하지 않는다.
+    function()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) * 1000000 / iterations
+
+
+async def measure_async(function, iterations: int):
+    await function()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await function()
+    return (time.perf_counter() - start) * 1000000 / iterations
+
+
+async def measure_post_detail(iterations: int):
+    # get_post_detail_async와 같은 조회. 이전에는 매번 select(Post).filter_by(...)를 만들었다.
+    async_engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(async_engine) as data_base:
+        _, post_id, board_id = await data_base.run_sync(setup)
+
+        async def select_post():
+            return (
+                await data_base.scalars(
+                    select(Post).filter_by(id=post_id, board_id=board_id)
+                )
+            ).first()
+
+        async def prepared_post():
+            return (
+                await data_base.scalars(
+                    post_detail_select, {"id": post_id, "board_id": board_id}
+                )
+            ).first()
+
+        results = [
+            None,
+            await measure_async(select_post, iterations),
+            await measure_async(prepared_post, iterations),
+        ]
+
+    await async_engine.dispose()
+    return results
+
+
+def format_results(name: str, results: list):
+    return f"{name:<14}" + "".join(
+        f"{'-':>14}" if result is None else f"{result:>14.1f}" for result in results
+    )
+
+
+def main(iterations: int):
+    print(f"{'query':<14}{'query() us':>14}{'select() us':>14}{'prepared us':>14}")
+    print(format_results("post detail", asyncio.run(measure_post_detail(iterations))))
+
+    # 메모리 DB를 사용해 SQLite 실행 시간보다 ORM 처리 시간이 드러나도록 한다.
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as data_base:
+        user_id, _, _ = setup(data_base)
+
+        cases = {
+            "token epoch": {
+                "query()": lambda: data_base.query(User)
+                .filter_by(id=user_id)
+                .with_entities(User.token_epoch)
+                .scalar(),
+                "select()": lambda: data_base.scalar(
+                    select(User.token_epoch).filter_by(id=user_id)
+                ),
+                "prepared": lambda: data_base.scalar(
+                    user_token_epoch_select, {"user_id": user_id}
+                ),
+            },
+        }
+
+        for name, functions in cases.items():
+            results = [measure(function, iterations) for function in functions.values()]
+            print(format_results(name, results))
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -11,6 +11,53 @@ class Settings(BaseSettings):
     APP_JWT_ADMIN_URL: str
     PASSWORD_ALGORITHM: str
     SQLALCHEMY_DATABASE_URL: str
+    # 비어 있으면 SQLALCHEMY_DATABASE_URL의 driver를 aiosqlite로 바꿔 사용한다.
+    SQLALCHEMY_ASYNC_DATABASE_URL: str = ""
+    # bind key별 database URL. 예) {"chat": "sqlite:///./db/chat.sqlite"}
+    # chat, auth, analytics, content table을 따로 파일에 둔다. (비어 있으면 모두 기본 database를 사용한다.)
+    # 파일이 다른 table 사이의 외래키는 검사되지 않으므로 SQLITE_FOREIGN_KEYS와 함께 사용하지 않는다.
+    SQLALCHEMY_DATABASE_BINDS: dict[str, str] = {}
+    # 연결마다 적용하는 SQLite PRAGMA (빈 값은 적용하지 않음)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE: str = "-16000"
+    SQLITE_MMAP_SIZE: str = "134217728"
+    SQLITE_BUSY_TIMEOUT: str = "5000"
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    # 기존 데이터와 test 초기화 순서가 외래키 검사를 전제로 하지 않으므로 기본값은 끈다.
+    SQLITE_FOREIGN_KEYS: str = ""
+    # 요청마다 SQL 수와 시간을 Server-Timing header와 log로 남긴다.
+    APP_QUERY_STATS_ENABLED: bool = True
+    # 이 시간(ms)보다 오래 걸린 SQL과 EXPLAIN QUERY PLAN을 기록한다. (0 이하는 기록하지 않음)
+    APP_SLOW_QUERY_MILLISECONDS: float = 100
+    APP_SLOW_QUERY_LOG_PATH: str = "db/slow_query.log"
+    APP_SLOW_QUERY_LOG_MAX_BYTES: int = 10485760
+    APP_SLOW_QUERY_LOG_BACKUP_COUNT: int = 5
+    # 목록 summary mode에서 반환하는 본문 미리보기 길이
+    APP_CONTENT_PREVIEW_LENGTH: int = 100
+    # 조회수는 process 메모리에 모아 두었다가 이 주기(초)마다 한 transaction으로 반영한다.
+    APP_POST_VIEW_FLUSH_SECONDS: float = 10
+    APP_POST_VIEW_COUNTER_SHARDS: int = 16
+    # True이면 조회마다 PostViewIncrement row를 저장한다. (process가 종료돼도 조회수를 잃지 않는다.)
+    APP_POST_VIEW_INCREMENT_ENABLED: bool = False
+    # update_post_view_counts가 한 transaction에서 반영하는 PostViewIncrement row 수
+    APP_POST_VIEW_AGGREGATE_BATCH_SIZE: int = 10000
+    APP_JWT_EPOCH_CACHE_SECONDS: int = 10
+    APP_JWT_SCOPE_CACHE_SECONDS: int = 10
+    APP_JWT_DECODE_CACHE_SIZE: int = 10000
+    APP_JWT_PURGE_BATCH_SIZE: int = 500
+    APP_PASSWORD_HASH_MAX_WORKERS: int = 2
+    APP_PASSWORD_HASH_MAX_QUEUE_SIZE: int = 64
+    APP_TOKEN_REVOCATION_MMAP_PATH: str = "db/token_revocation.mmap"
+    APP_TOKEN_REVOCATION_MMAP_SLOTS: int = 65536
+    APP_TOKEN_EPOCH_MMAP_PATH: str = "db/token_epoch.mmap"
+    APP_TOKEN_EPOCH_MMAP_SLOTS: int = 1048576
+    APP_LOGIN_RATE_LIMIT_USER_BURST: int = 5
+    APP_LOGIN_RATE_LIMIT_USER_PER_MINUTE: int = 5
+    APP_LOGIN_RATE_LIMIT_IP_BURST: int = 30
+    APP_LOGIN_RATE_LIMIT_IP_PER_MINUTE: int = 60
+    APP_LOGIN_RATE_LIMIT_SIZE: int = 65536
+    APP_LOGIN_RATE_LIMIT_MMAP_PATH: str = "db/login_rate_limit.mmap"
 
     model_config = SettingsConfigDict(env_file=".env")
 
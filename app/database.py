@@ -1,22 +1,393 @@
 from typing import Annotated, Optional
 import contextlib
+from contextvars import ContextVar
+from dataclasses import dataclass
+import logging
+from logging.handlers import RotatingFileHandler
+import sys
+import threading
+import time
 
-from fastapi import Depends
-from sqlalchemy import create_engine, MetaData
+from fastapi import Depends, Request
+from fastapi.requests import HTTPConnection
+from fastapi.routing import APIRoute
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, MetaData
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker, Session
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+    async_sessionmaker,
+)
+import greenlet
 
 from config import get_settings
 
 import json
 
 
-engine = create_engine(
-    get_settings().SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
+# engine은 import 시점이 아니라 create_database_engines에서 만든다.
+# (app factory와 celery worker process마다 한 번씩 호출한다.)
+engine: Optional[Engine] = None
+session_local = sessionmaker(autocommit=False, autoflush=False)
+
+# 읽기 전용 연결 (WAL에서는 writer가 쓰는 동안에도 읽을 수 있다.)
+read_engine: Optional[Engine] = None
+read_session_local = sessionmaker(autocommit=False, autoflush=False)
+
+# async session은 읽기 전용이다. 쓰기는 run_with_write_session_async로 engine을 사용한다.
+async_engine: Optional[AsyncEngine] = None
+# async session은 lazy load를 할 수 없으므로 commit 후에도 값을 유지한다.
+async_session_local = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+# bind key별 (engine, read_engine, async_engine). 기본 database는 default_bind_key를 사용한다.
+default_bind_key = "main"
+database_engines: dict[str, tuple[Engine, Engine, AsyncEngine]] = {}
+# bind key별 쓰기 lock. engine과 함께 만들므로 fork된 process는 부모의 lock을 물려받지 않는다.
+database_write_locks: dict[str, threading.Lock] = {}
+
+
+def get_async_database_url(database_url: str = None):
+    if database_url is None:
+        if get_settings().SQLALCHEMY_ASYNC_DATABASE_URL:
+            return get_settings().SQLALCHEMY_ASYNC_DATABASE_URL
+        database_url = get_settings().SQLALCHEMY_DATABASE_URL
+
+    return database_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+
+def get_bind_key(table) -> str:
+    # table의 info에 지정한 bind key가 설정에 없으면 기본 database 파일에 둔다.
+    bind_key = table.info.get("bind_key")
+    if bind_key in get_settings().SQLALCHEMY_DATABASE_BINDS:
+        return bind_key
+
+    return default_bind_key
+
+
+def get_bind_tables(bind_key: str) -> list:
+    return [
+        table
+        for table in Base.metadata.sorted_tables
+        if get_bind_key(table) == bind_key
+    ]
+
+
+def get_sqlite_pragmas():
+    # 빈 값은 SQLite 기본값을 그대로 사용한다. busy_timeout은 journal_mode 변경보다 먼저 적용한다.
+    return {
+        "busy_timeout": get_settings().SQLITE_BUSY_TIMEOUT,
+        "journal_mode": get_settings().SQLITE_JOURNAL_MODE,
+        "synchronous": get_settings().SQLITE_SYNCHRONOUS,
+        "cache_size": get_settings().SQLITE_CACHE_SIZE,
+        "mmap_size": get_settings().SQLITE_MMAP_SIZE,
+        "temp_store": get_settings().SQLITE_TEMP_STORE,
+        "foreign_keys": get_settings().SQLITE_FOREIGN_KEYS,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            if value is None or value == "":
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def set_sqlite_pragmas_on_connect(target_engine: Engine, pragmas: dict = None):
+    if target_engine.dialect.name != "sqlite":
+        return
+
+    if pragmas is None:
+        pragmas = get_sqlite_pragmas()
+
+    @event.listens_for(target_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+# 같은 process의 쓰기 transaction을 하나씩 commit해 SQLITE_BUSY 대기가 생기지 않도록 한다.
+# lock은 flush와 commit을 함께 실행하는 한 번의 threadpool 호출 동안만 잡는다. (await 사이에 잡고 있지 않는다.)
+@contextlib.contextmanager
+def hold_write_locks():
+    # 여러 database 파일에 쓰는 session도 있으므로 bind key 순서대로 모두 잡는다.
+    # 다른 process가 lock을 오래 잡는 경우처럼 busy_timeout이 지나면 SQLite에 맡긴다.
+    timeout = float(get_settings().SQLITE_BUSY_TIMEOUT or 5000) / 1000
+    acquired_write_locks = []
+    try:
+        for write_lock in list(database_write_locks.values()):
+            if write_lock.acquire(timeout=timeout):
+                acquired_write_locks.append(write_lock)
+        yield
+    finally:
+        for write_lock in reversed(acquired_write_locks):
+            write_lock.release()
+
+
+def commit_data_base(data_base: Session):
+    # flush할 변경이 없으면(읽기만 한 요청) lock을 잡지 않는다.
+    if not (data_base.new or data_base.dirty or data_base.deleted):
+        data_base.commit()
+        return
+
+    with hold_write_locks():
+        data_base.commit()
+
+
+def run_and_commit(function, data_base: Session, *args):
+    # async 요청의 쓰기(flush, UPDATE 포함)와 commit을 한 번의 threadpool 호출에서 실행한다.
+    with hold_write_locks():
+        result = function(data_base, *args)
+        data_base.commit()
+
+    return result
+
+
+query_stats_logger = logging.getLogger("database.query_stats")
+
+
+@dataclass
+class QueryStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+# 요청마다 새 QueryStats를 넣는다. threadpool로 넘어가도 같은 객체를 가리키므로 합산된다.
+request_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "request_query_stats", default=None
 )
-session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def count_queries_on_execute(target_engine: Engine):
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def start_query_timer(connection, cursor, statement, *args):
+        connection.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def stop_query_timer(connection, cursor, statement, *args):
+        query_seconds = time.perf_counter() - connection.info["query_start_time"].pop()
+
+        if connection.info.get("explaining_query"):
+            return
+
+        query_stats = request_query_stats.get()
+        if query_stats is not None:
+            query_stats.queries += 1
+            query_stats.query_seconds += query_seconds
+
+        slow_query_milliseconds = get_settings().APP_SLOW_QUERY_MILLISECONDS
+        if 0 < slow_query_milliseconds <= query_seconds * 1000:
+            record_slow_query(connection, statement, args[0], query_seconds)
+
+    @event.listens_for(target_engine, "handle_error")
+    def clear_query_timer(exception_context):
+        if exception_context.connection is not None:
+            exception_context.connection.info.pop("query_start_time", None)
+
+
+slow_query_logger = logging.getLogger("database.slow_query")
+
+
+def get_slow_query_logger():
+    # log 파일은 처음 느린 query가 기록될 때 만든다.
+    if not slow_query_logger.handlers:
+        handler = RotatingFileHandler(
+            get_settings().APP_SLOW_QUERY_LOG_PATH,
+            maxBytes=get_settings().APP_SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=get_settings().APP_SLOW_QUERY_LOG_BACKUP_COUNT,
+            encoding="UTF-8",
+        )
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.WARNING)
+        slow_query_logger.propagate = False
+
+    return slow_query_logger
+
+
+def get_parameters_shape(parameters):
+    # 값 대신 타입만 남겨 개인정보가 log에 남지 않도록 한다.
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"rows": len(parameters), "row": get_parameters_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def get_crud_caller():
+    # async session은 greenlet 안에서 실행되므로 부모 greenlet의 frame(coroutine)도 확인한다.
+    frames = [sys._getframe(1)]
+    parent = greenlet.getcurrent().parent
+    if parent is not None and parent.gr_frame is not None:
+        frames.append(parent.gr_frame)
+
+    for frame in frames:
+        while frame is not None:
+            module_name = frame.f_globals.get("__name__", "")
+            if module_name.endswith("_crud") or module_name.endswith(".tasks"):
+                return f"{module_name}.{frame.f_code.co_name}"
+            frame = frame.f_back
+
+    return None
+
+
+def get_query_plan(connection, statement: str, parameters):
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return []
+
+    if isinstance(parameters, list):
+        parameters = parameters[0] if parameters else ()
+
+    # EXPLAIN 실행도 cursor event를 발생시키므로 다시 기록되지 않도록 막는다.
+    connection.info["explaining_query"] = True
+    try:
+        rows = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).all()
+    except Exception as exception:
+        return [f"EXPLAIN 실패 : {exception}"]
+    finally:
+        connection.info.pop("explaining_query", None)
+
+    # (id, parent, notused, detail)
+    return [row[-1] for row in rows]
+
+
+def record_slow_query(connection, statement: str, parameters, query_seconds: float):
+    get_slow_query_logger().warning(
+        json_encoder.encode(
+            {
+                "milliseconds": round(query_seconds * 1000, 2),
+                "caller": get_crud_caller(),
+                "statement": statement,
+                "parameters": get_parameters_shape(parameters),
+                "plan": get_query_plan(connection, statement, parameters),
+            }
+        )
+    )
+
+
+def create_bind_engines(database_url: str, async_database_url: str):
+    bind_engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    set_sqlite_pragmas_on_connect(bind_engine)
+
+    bind_read_engine = create_engine(
+        database_url, connect_args={"check_same_thread": False}
+    )
+    set_sqlite_pragmas_on_connect(
+        bind_read_engine, {**get_sqlite_pragmas(), "query_only": "ON"}
+    )
+
+    bind_async_engine = create_async_engine(async_database_url)
+    set_sqlite_pragmas_on_connect(
+        bind_async_engine.sync_engine, {**get_sqlite_pragmas(), "query_only": "ON"}
+    )
+
+    for query_engine in (bind_engine, bind_read_engine, bind_async_engine.sync_engine):
+        count_queries_on_execute(query_engine)
+
+    return bind_engine, bind_read_engine, bind_async_engine
+
+
+def create_database_engines():
+    global engine, read_engine, async_engine
+
+    database_engines.clear()
+    database_write_locks.clear()
+    database_engines[default_bind_key] = create_bind_engines(
+        get_settings().SQLALCHEMY_DATABASE_URL, get_async_database_url()
+    )
+    # 설정한 bind key의 table은 따로 database 파일을 사용해 writer lock을 나눠 갖는다.
+    for bind_key, database_url in get_settings().SQLALCHEMY_DATABASE_BINDS.items():
+        database_engines[bind_key] = create_bind_engines(
+            database_url, get_async_database_url(database_url)
+        )
+
+    for bind_key in database_engines:
+        database_write_locks[bind_key] = threading.Lock()
+
+    engine, read_engine, async_engine = database_engines[default_bind_key]
+
+    binds = [{}, {}, {}]
+    for bind_key, bind_engines in database_engines.items():
+        if bind_key == default_bind_key:
+            continue
+        for table in get_bind_tables(bind_key):
+            for table_binds, bind_engine in zip(binds, bind_engines):
+                table_binds[table] = bind_engine
+
+    session_local.configure(bind=engine, binds=binds[0])
+    read_session_local.configure(bind=read_engine, binds=binds[1])
+    async_session_local.configure(bind=async_engine, binds=binds[2])
+
+
+def recreate_database_engines_after_fork():
+    # fork된 process는 부모의 pool(SQLite 연결)을 그대로 물려받는다.
+    # 부모가 쓰고 있는 연결을 닫지 않도록 close=False로 버리고 이 process의 engine을 새로 만든다.
+    # (write lock도 engine과 함께 새로 만들어지므로 부모가 잡고 있던 lock은 물려받지 않는다.)
+    for bind_engine, bind_read_engine, bind_async_engine in database_engines.values():
+        for query_engine in (
+            bind_engine,
+            bind_read_engine,
+            bind_async_engine.sync_engine,
+        ):
+            query_engine.dispose(close=False)
+
+    create_database_engines()
+
+
+class QueryStatsMiddleware:
+    # 요청마다 실행된 SQL 수와 시간을 Server-Timing header와 log로 남긴다.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not get_settings().APP_QUERY_STATS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        query_stats = QueryStats()
+        token = request_query_stats.set(query_stats)
+        start_time = time.perf_counter()
+        status_code = None
+
+        async def send_with_server_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                query_milliseconds = query_stats.query_seconds * 1000
+                total_milliseconds = (time.perf_counter() - start_time) * 1000
+                server_timing = (
+                    f'db;dur={query_milliseconds:.2f};desc="{query_stats.queries} queries", '
+                    f"app;dur={total_milliseconds:.2f}"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", server_timing.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            request_query_stats.reset(token)
+            query_stats_logger.info(
+                json_encoder.encode(
+                    {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "queries": query_stats.queries,
+                        "query_ms": round(query_stats.query_seconds * 1000, 2),
+                        "total_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                    }
+                )
+            )
 
 
 # SQLite 버그 패치
@@ -33,20 +404,82 @@ class Base(DeclarativeBase):
     metadata = MetaData(naming_convention=naming_convention)
 
 
+after_commit_logger = logging.getLogger("database.after_commit")
+
+
+def run_after_commit(data_base: Session, callback):
+    data_base.info.setdefault("after_commit_callbacks", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def run_after_commit_callbacks(data_base: Session):
+    # callback 하나가 실패해도 나머지 callback(캐시 무효화 등)은 실행한다.
+    for callback in data_base.info.pop("after_commit_callbacks", []):
+        try:
+            callback()
+        except Exception:
+            after_commit_logger.exception("after commit callback 실패 : %r", callback)
+
+
+@event.listens_for(Session, "after_rollback")
+def clear_after_commit_callbacks(data_base: Session):
+    data_base.info.pop("after_commit_callbacks", None)
+
+
 def database_engine_shutdown():
-    global engine
-    if engine:
-        engine.dispose()
+    for bind_engine, bind_read_engine, _ in database_engines.values():
+        bind_engine.dispose()
+        bind_read_engine.dispose()
 
 
-def get_data_base():
+async def async_database_engine_shutdown():
+    for _, _, bind_async_engine in database_engines.values():
+        await bind_async_engine.dispose()
+
+
+def get_data_base(connection: HTTPConnection):
+    # 요청 하나를 하나의 transaction으로 처리한다. commit은 UnitOfWorkRoute가 응답 전에 한 번 실행한다.
     data_base = session_local()
+    connection.state.data_base = data_base
     try:
         yield data_base
+    except Exception:
+        data_base.rollback()
+        raise
     finally:
         data_base.close()
 
 
+class UnitOfWorkRoute(APIRoute):
+    # FastAPI 0.105에서는 yield 이후의 코드가 응답을 보낸 뒤 실행되므로 commit 실패를 응답에 반영할 수 없다.
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def unit_of_work_route_handler(request: Request):
+            response = await route_handler(request)
+
+            data_base = getattr(request.state, "data_base", None)
+            if data_base is not None:
+                await run_in_threadpool(commit_data_base, data_base)
+
+            return response
+
+        return unit_of_work_route_handler
+
+
+def get_read_data_base():
+    data_base = read_session_local()
+    try:
+        yield data_base
+    finally:
+        data_base.close()
+
+
+async def get_async_data_base():
+    async with async_session_local() as data_base:
+        yield data_base
+
+
 @contextlib.contextmanager
 def get_data_base_for_decorator():
     data_base = session_local()
@@ -56,6 +489,19 @@ def get_data_base_for_decorator():
         data_base.close()
 
 
+def run_with_write_session(function, **kwargs):
+    # 쓰기 session을 요청 전체가 아닌 이 작업 동안만 연다.
+    with get_data_base_for_decorator() as data_base:
+        with hold_write_locks():
+            result = function(data_base=data_base, **kwargs)
+            data_base.commit()
+        return result
+
+
+async def run_with_write_session_async(function, **kwargs):
+    return await run_in_threadpool(run_with_write_session, function, **kwargs)
+
+
 json_encoder = json.JSONEncoder()
 
 
@@ -64,9 +510,11 @@ def get_data_base_decorator(f):
         with get_data_base_for_decorator() as data_base:
             if "data_base" in kwargs:
                 kwargs["data_base"] = data_base
-            f(data_base, *args, **kwargs)
+            return f(data_base, *args, **kwargs)
 
     return wrapper
 
 
 data_base_dependency = Annotated[Session, Depends(get_data_base)]
+read_data_base_dependency = Annotated[Session, Depends(get_read_data_base)]
+async_data_base_dependency = Annotated[AsyncSession, Depends(get_async_data_base)]
@@ -6,9 +6,16 @@ from pydantic import ValidationError
 
 from starlette import status
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from models import User, Board, UserPermissionTable, JWTRefreshTokenList
+from models import (
+    User,
+    Board,
+    UserPermissionTable,
+    UserPermissionDenyTable,
+    recount_aggregate_counters,
+)
 from domain.user.user_crud import (
     get_user_with_username,
     get_user_with_email,
@@ -16,11 +23,14 @@ from domain.user.user_crud import (
 from domain.user import user_schema
 from database import data_base_dependency, get_data_base_decorator
 from auth import (
-    get_password_context,
-    ban_access_token,
+    hash_password,
+    invalidate_user_board_scopes,
     current_user_payload,
     current_admin_payload,
+    password_hash_executor,
+    jwt_decode_cache,
 )
+from pagination import paginate, get_page
 from http_execption_params import http_exception_params
 
 
@@ -71,7 +81,7 @@ def create_admin_with_terminal(data_base: Session = None, debug=False):
 
     user = User(
         name=name,
-        password=get_password_context().hash(password1 + generated_password_salt),
+        password=hash_password(password1, generated_password_salt),
         password_salt=generated_password_salt,
         email=email,
         is_superuser=True,
@@ -83,15 +93,29 @@ def create_admin_with_terminal(data_base: Session = None, debug=False):
         return user.id
 
 
+@get_data_base_decorator
+def recount_aggregate_counters_with_terminal(data_base: Session = None):
+    recount_aggregate_counters(data_base)
+    data_base.commit()
+    print("Aggregate counters recounted")
+
+
 def get_users(data_base: data_base_dependency):
     return data_base.query(User).all()
 
 
+def get_server_stats():
+    # 요청을 처리한 worker process의 값이다. (process마다 따로 센다.)
+    return {
+        "password_hash_executor": password_hash_executor.stats(),
+        "jwt_decode_cache": jwt_decode_cache.stats(),
+    }
+
+
 def update_user_is_banned(data_base: data_base_dependency, id: int, is_banned: bool):
     user = data_base.query(User).filter_by(id=id).first()
     user.is_banned = is_banned
     data_base.add(user)
-    data_base.commit()
 
 
 def create_board(
@@ -102,24 +126,13 @@ def create_board(
     user_id_list: list[int] = None,
 ):
     board = Board(name=name, information=information, is_visible=is_visible)
-    data_base.add(board)
-    data_base.commit()
-
-    users = []
     board.permission_verified_user_id_range = (
-        data_base.query(User).order_by(User.id.desc()).first().id
+        data_base.query(func.max(User.id)).scalar() or 0
     )
 
-    if board.is_visible:
-        if not user_id_list:
-            users = data_base.query(User).order_by(User.id.asc()).all()
-        else:
-            users = (
-                data_base.query(User)
-                .filter(User.id.in_(user_id_list))
-                .order_by(User.id.asc())
-                .all()
-            )
+    if board.is_visible and not user_id_list:
+        # 모든 user에게 row를 추가하지 않고 user id 범위로 권한을 부여한다.
+        board.is_permission_implicit = True
     else:
         if not user_id_list:
             users = (
@@ -136,27 +149,15 @@ def create_board(
                 .all()
             )
 
-    if users:
-        for user in users:
-            user.boards.append(board)
+        board.users = users
 
-    data_base.commit()
-
-    users_refresh_token_table = (
-        data_base.query(JWTRefreshTokenList)
-        .filter(JWTRefreshTokenList.user_id <= board.permission_verified_user_id_range)
-        .all()
-    )
-
-    for user in users_refresh_token_table:
-        ban_access_token(
-            data_base=data_base,
-            user_id=user.user_id,
-            user_access_token=user.access_token,
-        )
+    data_base.add(board)
+    invalidate_user_board_scopes(data_base=data_base)
+    data_base.flush()
 
     return board.id
 
+
 def update_user_board_permission(
     data_base: data_base_dependency, user_id: int, board_id: int, is_visible: bool
 ):
@@ -168,12 +169,26 @@ def update_user_board_permission(
         .first()
     )
 
+    is_implicit = board.is_permission_implicit and (
+        user_id <= board.permission_verified_user_id_range
+    )
+    is_denied = (
+        data_base.query(UserPermissionDenyTable)
+        .filter_by(user_id=user_id, board_id=board_id)
+        .first()
+    )
+
     if is_visible:
-        if not permission:
+        # 규칙으로 이미 권한이 있는 user는 거부 row만 지우고 권한 row를 만들지 않는다.
+        if not permission and not is_implicit:
             user.boards.append(board)
+        if is_denied:
+            board.users_denied.remove(user)
     else:
         if permission:
             user.boards.remove(board)
+        if is_implicit and not is_denied:
+            board.users_denied.append(user)
 
     # user_permisson_table을 table로 사용시의 코드
     # query = user_permisson_table.select().where(
@@ -187,7 +202,7 @@ def update_user_board_permission(
     #     if data_base.execute(query).fetchall():
     #         user.boards.remove(board)
 
-    data_base.commit()
+    invalidate_user_board_scopes(data_base=data_base, user_id=user_id)
 
 
 def get_board(
@@ -204,6 +219,8 @@ def get_boards(
     is_available: bool | None,
     skip: int | None,
     limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
 
     filter_kwargs = {}
@@ -223,9 +240,14 @@ def get_boards(
         filter_kwargs["is_available"] = True
 
     boards = data_base.query(Board).filter_by(**filter_kwargs).order_by(Board.id.asc())
-    total = boards.count()
-    boards = boards.offset(skip).limit(limit).all()
-    return {"total": total, "boards": boards}
+    total = boards.count() if include_total else None
+    order_columns = [Board.id]
+    boards, next_cursor = get_page(
+        paginate(boards, order_columns, skip, limit, cursor).all(),
+        order_columns,
+        limit,
+    )
+    return {"total": total, "boards": boards, "next_cursor": next_cursor}
 
 
 def update_board(
@@ -252,7 +274,6 @@ def update_board(
         board.is_available = is_available
 
     data_base.add(board)
-    data_base.commit()
 
 
 def delete_board(
@@ -266,4 +287,4 @@ def delete_board(
     #     raise HTTPException(**http_exception_params["ai_model_not_found"])
 
     data_base.delete(board)
-    data_base.commit()
+    invalidate_user_board_scopes(data_base=data_base)
@@ -3,7 +3,7 @@ from typing import Annotated
 from fastapi import APIRouter, Depends
 from starlette import status
 
-from database import data_base_dependency
+from database import data_base_dependency, UnitOfWorkRoute
 from domain.admin import admin_schema, admin_crud
 from auth import (
     current_admin_payload,
@@ -13,7 +13,9 @@ from auth import (
 )
 import v1_url
 
-router = APIRouter(prefix=v1_url.ADMIN_PREFIX, tags=["admin"])
+router = APIRouter(
+    prefix=v1_url.ADMIN_PREFIX, tags=["admin"], route_class=UnitOfWorkRoute
+)
 
 
 @router.get(
@@ -83,7 +85,7 @@ def get_board(
     # schema: Annotated[ai_schema.RequestAIRead, Depends()],
     board_id: int,
 ):
-    scope_checker(token=token, target_scopes=[board_id])
+    scope_checker(data_base=data_base, token=token, target_scopes=[board_id])
 
     return admin_crud.get_board(
         data_base=data_base,
@@ -100,6 +102,8 @@ def get_boards(
     is_available: bool | None = None,
     skip: int | None = None,
     limit: int | None = None,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
     return admin_crud.get_boards(
         data_base=data_base,
@@ -108,6 +112,8 @@ def get_boards(
         is_available=is_available,
         skip=skip,
         limit=limit,
+        cursor=cursor,
+        include_total=include_total,
     )
 
 
@@ -145,3 +151,11 @@ def delete_board(
         token=token,
         id=board_id,
     )
+
+
+@router.get(
+    v1_url.ADMIN_GET_SERVER_STATS,
+    dependencies=[Depends(validate_and_decode_admin_access_token)],
+)
+def get_server_stats():
+    return admin_crud.get_server_stats()
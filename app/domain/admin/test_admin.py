@@ -6,13 +6,12 @@ from fastapi.testclient import TestClient
 
 from httpx import Response
 
-from main import app
 from domain.admin.admin_crud import create_admin_with_terminal
-from models import User, Board, UserPermissionTable
+from models import User, Board, UserPermissionTable, UserPermissionDenyTable
 from database import session_local
 import v1_url
 from domain.user.test_user import user_test_methods
-from test_main import main_test_methods
+from test_main import app, main_test_methods
 
 client = TestClient(app)
 
@@ -38,6 +37,11 @@ url_dict = {
         v1_url.ADMIN_PREFIX,
         v1_url.ADMIN_CREATE_BOARD,
     ],
+    "URL_ADMIN_GET_BOARD": [
+        v1_url.API_V1_ROUTER_PREFIX,
+        v1_url.ADMIN_PREFIX,
+        v1_url.ADMIN_GET_BOARD,
+    ],
     "URL_ADMIN_UPDATE_USER_BOARD_PERMISSION": [
         v1_url.API_V1_ROUTER_PREFIX,
         v1_url.ADMIN_PREFIX,
@@ -48,6 +52,11 @@ url_dict = {
         v1_url.ADMIN_PREFIX,
         v1_url.ADMIN_UPDATE_USER_IS_BANNED,
     ],
+    "URL_ADMIN_GET_SERVER_STATS": [
+        v1_url.API_V1_ROUTER_PREFIX,
+        v1_url.ADMIN_PREFIX,
+        v1_url.ADMIN_GET_SERVER_STATS,
+    ],
 }
 
 
@@ -55,12 +64,14 @@ URL_USER_CREATE_USER = "".join(url_dict.get("URL_USER_CREATE_USER"))
 URL_USER_LOGIN_USER = "".join(url_dict.get("URL_USER_LOGIN_USER"))
 URL_ADMIN_GET_USERS = "".join(url_dict.get("URL_ADMIN_GET_USERS"))
 URL_ADMIN_CREATE_BOARD = "".join(url_dict.get("URL_ADMIN_CREATE_BOARD"))
+URL_ADMIN_GET_BOARD = "".join(url_dict.get("URL_ADMIN_GET_BOARD"))
 URL_ADMIN_UPDATE_USER_BOARD_PERMISSION = "".join(
     url_dict.get("URL_ADMIN_UPDATE_USER_BOARD_PERMISSION")
 )
 URL_ADMIN_UPDATE_USER_IS_BANNED = "".join(
     url_dict.get("URL_ADMIN_UPDATE_USER_IS_BANNED")
 )
+URL_ADMIN_GET_SERVER_STATS = "".join(url_dict.get("URL_ADMIN_GET_SERVER_STATS"))
 
 
 def parameter_data_loader(path):
@@ -171,6 +182,27 @@ class AdminTestMethods:
             user: dict
             assert set(user_columns) == set(user.keys())
 
+    def get_server_stats(self, access_token: str):
+        # 로그인 후 진행
+
+        response_test = client.get(
+            URL_ADMIN_GET_SERVER_STATS,
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+
+        return response_test
+
+    def get_server_stats_test(self, server_stats_keys: dict, response_test: Response):
+        # get_server_stats 후 진행
+
+        assert response_test.status_code == 200
+
+        response_test_json: dict = response_test.json()
+
+        assert set(server_stats_keys) == set(response_test_json.keys())
+        for name, stats_keys in server_stats_keys.items():
+            assert set(stats_keys) == set(response_test_json.get(name).keys())
+
     def create_board(
         self, board_name, board_information, board_is_visible, access_token: str
     ):
@@ -210,6 +242,14 @@ class AdminTestMethods:
         assert board.information == board_information
         assert board.is_visible == board_is_visible
 
+        # 공개 board는 user마다 권한 row를 만들지 않는다.
+        if board_is_visible:
+            assert board.is_permission_implicit
+            assert (
+                data_base.query(UserPermissionTable).filter_by(board_id=board.id).count()
+                == 0
+            )
+
         data_base.close()
 
     def update_user_board_permission(
@@ -242,14 +282,61 @@ class AdminTestMethods:
             .filter_by(user_id=user_id, board_id=board_id)
             .first()
         )
+        user_board_permission_denied = (
+            data_base.query(UserPermissionDenyTable)
+            .filter_by(user_id=user_id, board_id=board_id)
+            .first()
+        )
+        board = data_base.query(Board).filter_by(id=board_id).first()
+        is_implicit = board.is_permission_implicit and (
+            user_id <= board.permission_verified_user_id_range
+        )
 
+        # 규칙으로 권한이 있는 user는 권한 row 대신 거부 row로 관리한다.
         if user_is_permitted:
-            assert user_board_permission != None
+            assert user_board_permission_denied == None
+            assert (user_board_permission == None) == is_implicit
         else:
             assert user_board_permission == None
+            assert (user_board_permission_denied != None) == is_implicit
 
         data_base.close()
 
+    def get_board(self, board_id, access_token: str):
+        response_test = client.get(
+            URL_ADMIN_GET_BOARD,
+            params={"board_id": board_id},
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+
+        return response_test
+
+    def board_scope_cache_test(self, name, access_token: str):
+        # 권한 변경 후 토큰 재발급 없이 바로 반영되는지 확인
+        data_base = session_local()
+
+        user_id = data_base.query(User).filter_by(name=name).first().id
+        board_id = (
+            data_base.query(Board).filter_by(is_permission_implicit=True).first().id
+        )
+
+        data_base.close()
+
+        assert self.get_board(board_id, access_token).status_code == 200
+
+        response_test = self.update_user_board_permission(
+            user_id, board_id, False, access_token
+        )
+        self.update_user_board_permission_test(user_id, board_id, False, response_test)
+        assert self.get_board(board_id, access_token).status_code == 403
+
+        # 규칙으로 권한이 있는 user에게 다시 허용하면 거부 row만 지운다.
+        response_test = self.update_user_board_permission(
+            user_id, board_id, True, access_token
+        )
+        self.update_user_board_permission_test(user_id, board_id, True, response_test)
+        assert self.get_board(board_id, access_token).status_code == 200
+
     def update_user_is_banned(self, user_id, user_is_banned, access_token: str):
         # 로그인 후 진행
 
@@ -313,6 +400,17 @@ class TestAdmin:
         response_test = admin_test_methods.get_users(access_token)
         admin_test_methods.get_users_test(user_columns, response_test)
 
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/admin/test_get_server_stats.json")
+    )
+    def test_get_server_stats(self, pn, name, password1, server_stats_keys):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+
+        response_test = admin_test_methods.get_server_stats(access_token)
+        admin_test_methods.get_server_stats_test(server_stats_keys, response_test)
+
     @pytest.mark.parametrize(
         **parameter_data_loader("domain/admin/test_create_board.json")
     )
@@ -365,6 +463,16 @@ class TestAdmin:
                 response_test=response_test,
             )
 
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/admin/test_board_scope_cache.json")
+    )
+    def test_board_scope_cache(self, pn, name, password1):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+
+        admin_test_methods.board_scope_cache_test(name, access_token)
+
     @pytest.mark.parametrize(
         **parameter_data_loader("domain/admin/test_update_user_is_banned.json")
     )
@@ -4,8 +4,9 @@ from fastapi import HTTPException
 from starlette import status
 
 from models import AI, AIlog
-from database import data_base_dependency
+from database import data_base_dependency, run_after_commit
 from auth import current_user_payload, current_admin_payload
+from pagination import paginate, get_page
 from domain.ai import tasks
 
 from celery import uuid
@@ -32,13 +33,17 @@ def create_ai(
         celery_task_id=celery_task_id,
     )
     data_base.add(ai)
-    data_base.commit()
-
-    async_task = tasks.train_ai_task.apply_async(
-        kwargs={"data_base": None, "ai_id": ai.id, "is_visible": is_visible},
-        task_id=celery_task_id,
+    data_base.flush()
+
+    # worker가 AI row를 읽을 수 있도록 commit 이후에 작업을 등록한다.
+    run_after_commit(
+        data_base,
+        lambda: tasks.train_ai_task.apply_async(
+            kwargs={"data_base": None, "ai_id": ai.id, "is_visible": is_visible},
+            task_id=celery_task_id,
+        ),
     )
-    return (async_task, ai.id)
+    return (celery_task_id, ai.id)
 
 
 def get_ai(
@@ -61,6 +66,8 @@ def get_ais(
     is_available: bool | None,
     skip: int | None,
     limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
     filter_kwargs = {}
 
@@ -79,9 +86,12 @@ def get_ais(
         filter_kwargs["is_available"] = True
 
     ais = data_base.query(AI).filter_by(**filter_kwargs).order_by(AI.id.asc())
-    total = ais.count()
-    ais = ais.offset(skip).limit(limit).all()
-    return {"total": total, "ais": ais}
+    total = ais.count() if include_total else None
+    order_columns = [AI.id]
+    ais, next_cursor = get_page(
+        paginate(ais, order_columns, skip, limit, cursor).all(), order_columns, limit
+    )
+    return {"total": total, "ais": ais, "next_cursor": next_cursor}
 
 
 def update_ai(
@@ -105,7 +115,6 @@ def update_ai(
         ai.is_available = is_available
 
     data_base.add(ai)
-    data_base.commit()
 
 
 def delete_ai(
@@ -123,7 +132,6 @@ def delete_ai(
         celery_task.revoke(terminate=True)
 
     data_base.delete(ai)
-    data_base.commit()
 
 
 def create_ailog(
@@ -153,13 +161,16 @@ def create_ailog(
     )
 
     data_base.add(ai_log)
-    data_base.commit()
-
-    async_task = tasks.infer_ai_task.apply_async(
-        kwargs={"data_base": None, "ai_id": ai.id, "ai_log_id": ai_log.id},
-        task_id=celery_task_id,
+    data_base.flush()
+
+    run_after_commit(
+        data_base,
+        lambda: tasks.infer_ai_task.apply_async(
+            kwargs={"data_base": None, "ai_id": ai.id, "ai_log_id": ai_log.id},
+            task_id=celery_task_id,
+        ),
     )
-    return (async_task, ai_log.id)
+    return (celery_task_id, ai_log.id)
 
 
 def get_ailog(
@@ -184,6 +195,8 @@ def get_ailogs(
     ai_id: int | None,
     skip: int | None,
     limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
     filter_kwargs = {}
 
@@ -202,9 +215,20 @@ def get_ailogs(
         filter_kwargs["ai_id"] = ai_id
 
     ailogs = data_base.query(AIlog).filter_by(**filter_kwargs).order_by(AIlog.id.asc())
-    total = ailogs.count()
-    ailogs = ailogs.offset(skip).limit(limit).all()
-    return {"total": total, "ailogs": ailogs}
+    total = None
+    if include_total:
+        # AI별 개수는 유지되는 칼럼을 읽고, user_id로 filter한 경우만 COUNT(*)를 사용한다.
+        if list(filter_kwargs) == ["ai_id"]:
+            total = data_base.query(AI.number_of_ailog).filter_by(id=ai_id).scalar() or 0
+        else:
+            total = ailogs.count()
+    order_columns = [AIlog.id]
+    ailogs, next_cursor = get_page(
+        paginate(ailogs, order_columns, skip, limit, cursor).all(),
+        order_columns,
+        limit,
+    )
+    return {"total": total, "ailogs": ailogs, "next_cursor": next_cursor}
 
 
 def update_ailog(
@@ -224,7 +248,6 @@ def update_ailog(
         ailog.description = description
 
     data_base.add(ailog)
-    data_base.commit()
 
 
 def delete_ailog(
@@ -243,4 +266,3 @@ def delete_ailog(
         celery_task.revoke(terminate=True)
 
     data_base.delete(ailog)
-    data_base.commit()
@@ -3,12 +3,14 @@ from typing import Annotated
 from fastapi import APIRouter, Depends
 from starlette import status
 
-from database import data_base_dependency
+from database import data_base_dependency, read_data_base_dependency, UnitOfWorkRoute
 from domain.ai import ai_crud, ai_schema
 from auth import current_user_payload, current_admin_payload
 import v1_url
 
-router = APIRouter(prefix=v1_url.AI_PREFIX, tags=["ai"])
+router = APIRouter(
+    prefix=v1_url.AI_PREFIX, tags=["ai"], route_class=UnitOfWorkRoute
+)
 
 
 @router.post(v1_url.AI_TRAIN_AI, status_code=status.HTTP_201_CREATED)
@@ -17,7 +19,7 @@ def train_ai(
     token: current_admin_payload,
     schema: ai_schema.RequestAICreate,
 ):
-    async_task, ai_id = ai_crud.create_ai(
+    task_id, ai_id = ai_crud.create_ai(
         data_base=data_base,
         token=token,
         name=schema.name,
@@ -25,12 +27,12 @@ def train_ai(
         is_visible=schema.is_visible,
     )
 
-    return {"task_id": async_task.id, "id" : ai_id}
+    return {"task_id": task_id, "id" : ai_id}
 
 
 @router.get(v1_url.AI_GET_AI)
 def get_ai(
-    data_base: data_base_dependency,
+    data_base: read_data_base_dependency,
     token: current_user_payload,
     schema: Annotated[ai_schema.RequestAIRead, Depends()],
 ):
@@ -43,7 +45,7 @@ def get_ai(
 
 @router.get(v1_url.AI_GET_AIS)
 def get_ais(
-    data_base: data_base_dependency,
+    data_base: read_data_base_dependency,
     token: current_user_payload,
     schema: Annotated[ai_schema.RequestAIsRead, Depends()],
 ):
@@ -54,6 +56,8 @@ def get_ais(
         is_visible=schema.is_visible,
         skip=schema.skip,
         limit=schema.limit,
+        cursor=schema.cursor,
+        include_total=schema.include_total,
     )
 
 
@@ -92,18 +96,18 @@ def ai_infer(
     token: current_user_payload,
     schema: ai_schema.RequestAILogCreate,
 ):
-    async_task, ai_log_id = ai_crud.create_ailog(
+    task_id, ai_log_id = ai_crud.create_ailog(
         data_base=data_base,
         token=token,
         ai_id=schema.ai_id,
         description=schema.description,
     )
-    return {"task_id": async_task.id, "id" : ai_log_id}
+    return {"task_id": task_id, "id" : ai_log_id}
 
 
 @router.get(v1_url.AI_GET_AILOG)
 def get_ailog(
-    data_base: data_base_dependency,
+    data_base: read_data_base_dependency,
     token: current_user_payload,
     schema: Annotated[ai_schema.RequestAILogRead, Depends()],
 ):
@@ -116,7 +120,7 @@ def get_ailog(
 
 @router.get(v1_url.AI_GET_AILOGS)
 def get_ailogs(
-    data_base: data_base_dependency,
+    data_base: read_data_base_dependency,
     token: current_user_payload,
     schema: Annotated[ai_schema.RequestAILogsRead, Depends()],
 ):
@@ -127,6 +131,8 @@ def get_ailogs(
         ai_id=schema.ai_id,
         skip=schema.skip,
         limit=schema.limit,
+        cursor=schema.cursor,
+        include_total=schema.include_total,
     )
 
 
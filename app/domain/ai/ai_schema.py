@@ -25,6 +25,8 @@ class RequestAIsRead(BaseModel):
     is_available: bool | None = Field(default=None)
     skip: int | None = Field(default=None, ge=0)
     limit: int | None = Field(default=None, ge=1)
+    cursor: str | None = Field(default=None, max_length=256)
+    include_total: bool = Field(default=True)
 
 
 class RequestAIUpdate(BaseModel):
@@ -58,6 +60,8 @@ class RequestAILogsRead(BaseModel):
     ai_id: int | None = Field(default=None, ge=1)
     skip: int | None = Field(default=None, ge=0)
     limit: int | None = Field(default=None, ge=1)
+    cursor: str | None = Field(default=None, max_length=256)
+    include_total: bool = Field(default=True)
 
 
 class RequestAILogUpdate(BaseModel):
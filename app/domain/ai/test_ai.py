@@ -8,14 +8,13 @@ from httpx import Response
 
 from celery.result import AsyncResult
 
-from main import app
 from models import AI, AIlog
 from database import session_local
 from auth import validate_and_decode_user_access_token
 import v1_url
 from domain.user.test_user import user_test_methods
 from domain.admin.test_admin import admin_test_methods
-from test_main import main_test_methods
+from test_main import app, main_test_methods
 
 client = TestClient(app)
 
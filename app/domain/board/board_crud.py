@@ -1,14 +1,43 @@
+from sqlalchemy import select, update, bindparam
 from sqlalchemy.orm import Session
 from datetime import datetime
+import asyncio
+import logging
 import uuid
 
 from fastapi import UploadFile
 
 from models import Post, User, Board, Comment, PostFile, CommentFile, PostViewIncrement
 from domain.board import board_schema
-from database import data_base_dependency
-from auth import current_user_payload
+from database import (
+    data_base_dependency,
+    async_data_base_dependency,
+    run_with_write_session_async,
+)
+from config import get_settings
+from auth import current_user_payload, current_user_payload_async
+from pagination import paginate, get_page, get_summary_columns
 from http_execption_params import http_exception_params
+from view_counter import ShardedCounter
+
+
+logger = logging.getLogger(__name__)
+
+
+# 자주 호출되는 조회는 statement를 미리 만들어 두고 값만 바꿔 실행한다. (compile 결과를 재사용)
+post_detail_select = select(Post).where(
+    Post.id == bindparam("id"), Post.board_id == bindparam("board_id")
+)
+post_table = Post.__table__
+post_view_count_update = (
+    update(post_table)
+    .where(post_table.c.id == bindparam("post_id"))
+    .values(number_of_view=post_table.c.number_of_view + bindparam("count"))
+)
+
+# post id -> 아직 반영하지 않은 조회수 (process마다 따로 센다.)
+post_view_counter = ShardedCounter(get_settings().APP_POST_VIEW_COUNTER_SHARDS)
+
 
 def create_post(
     data_base: data_base_dependency,
@@ -29,7 +58,7 @@ def create_post(
         is_visible=is_visible,
     )
     data_base.add(post)
-    data_base.commit()
+    data_base.flush()
 
     if files != None:
         for i, file in enumerate(files):
@@ -46,17 +75,19 @@ def create_post(
                         file_path=file_path,
                     )
                     data_base.add(post_file)
-                    data_base.commit()
 
     return post.id
 
 
-def get_posts(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_posts_async(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     board_id: int,
     skip: int | None,
     limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
+    is_summary: bool = False,
 ):
     filter_kwargs = {"board_id": board_id}
 
@@ -66,32 +97,92 @@ def get_posts(
         limit = 10
 
     posts = (
-        data_base.query(Post)
+        select(*get_summary_columns(Post, Post.content) if is_summary else [Post])
         .filter_by(**filter_kwargs)
         .order_by(Post.create_date.desc(), Post.id.desc())
     )
-    total = posts.count()
-    posts = posts.offset(skip).limit(limit).all()
+    total = None
+    if include_total:
+        total = (
+            await data_base.scalar(select(Board.number_of_post).filter_by(id=board_id))
+            or 0
+        )
+    order_columns = [Post.create_date, Post.id]
+    posts = await data_base.execute(
+        paginate(posts, order_columns, skip, limit, cursor, is_descending=True)
+    )
+    posts, next_cursor = get_page(
+        posts.all() if is_summary else posts.scalars().all(), order_columns, limit
+    )
+    if is_summary:
+        posts = [post._asdict() for post in posts]
 
-    return {"total": total, "posts": posts}
+    return {"total": total, "posts": posts, "next_cursor": next_cursor}
 
 
 def record_post_view(data_base: data_base_dependency, post_id: int):
+    if not get_settings().APP_POST_VIEW_INCREMENT_ENABLED:
+        post_view_counter.add(post_id)
+        return
+
     post_view_increment: PostViewIncrement = PostViewIncrement(
         post_id=post_id,
     )
     data_base.add(post_view_increment)
-    data_base.commit()
 
 
-def get_post_detail(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def record_post_view_async(post_id: int):
+    if not get_settings().APP_POST_VIEW_INCREMENT_ENABLED:
+        post_view_counter.add(post_id)
+        return
+
+    # async session은 읽기 전용이므로 쓰기 session으로 기록한다.
+    await run_with_write_session_async(record_post_view, post_id=post_id)
+
+
+def flush_post_view_counts(data_base: Session):
+    post_view_counts = post_view_counter.drain()
+    if not post_view_counts:
+        return 0
+
+    # 게시글마다 UPDATE post SET number_of_view = number_of_view + ? 를 한 transaction에서 실행한다.
+    try:
+        data_base.execute(
+            post_view_count_update,
+            [
+                {"post_id": post_id, "count": count}
+                for post_id, count in post_view_counts.items()
+            ],
+        )
+        data_base.commit()
+    except Exception:
+        data_base.rollback()
+        # 반영하지 못한 조회수는 다음 flush에서 다시 반영한다.
+        post_view_counter.add_all(post_view_counts)
+        raise
+
+    return len(post_view_counts)
+
+
+async def flush_post_view_counts_periodically():
+    while True:
+        await asyncio.sleep(get_settings().APP_POST_VIEW_FLUSH_SECONDS)
+        try:
+            await run_with_write_session_async(flush_post_view_counts)
+        except Exception:
+            logger.exception("조회수 반영 실패")
+
+
+async def get_post_detail_async(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     id: int,
     board_id: int,
 ):
-    record_post_view(data_base=data_base, post_id=id)
-    return data_base.query(Post).filter_by(id=id, board_id=board_id).first()
+    await record_post_view_async(post_id=id)
+    return (
+        await data_base.scalars(post_detail_select, {"id": id, "board_id": board_id})
+    ).first()
 
 
 def update_post(
@@ -124,7 +215,6 @@ def update_post(
         post.is_visible = is_visible
 
     data_base.add(post)
-    data_base.commit()
 
 
 def delete_post(
@@ -143,7 +233,6 @@ def delete_post(
         .first()
     )
     data_base.delete(post)
-    data_base.commit()
 
 
 def create_comment(
@@ -163,7 +252,7 @@ def create_comment(
         is_visible=is_visible,
     )
     data_base.add(comment)
-    data_base.commit()
+    data_base.flush()
 
     if files != None:
         for i, file in enumerate(files):
@@ -180,17 +269,18 @@ def create_comment(
                         file_path=file_path,
                     )
                     data_base.add(comment_file)
-                    data_base.commit()
 
     return comment.id
 
 
-def get_comments(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_comments_async(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     post_id: int,
     skip: int | None,
     limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
     filter_kwargs = {"post_id": post_id}
 
@@ -200,23 +290,41 @@ def get_comments(
         limit = 10
 
     comments = (
-        data_base.query(Comment)
+        select(Comment)
         .filter_by(**filter_kwargs)
         .order_by(Comment.create_date.desc(), Comment.id.desc())
     )
-    total = comments.count()
-    comments = comments.offset(skip).limit(limit).all()
+    total = None
+    if include_total:
+        total = (
+            await data_base.scalar(select(Post.number_of_comment).filter_by(id=post_id))
+            or 0
+        )
+    order_columns = [Comment.create_date, Comment.id]
+    comments, next_cursor = get_page(
+        (
+            await data_base.scalars(
+                paginate(
+                    comments, order_columns, skip, limit, cursor, is_descending=True
+                )
+            )
+        ).all(),
+        order_columns,
+        limit,
+    )
 
-    return {"total": total, "comments": comments}
+    return {"total": total, "comments": comments, "next_cursor": next_cursor}
 
 
-def get_comment_detail(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_comment_detail_async(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     id: int,
     post_id: int,
 ):
-    comment_detail = data_base.query(Comment).filter_by(id=id, post_id=post_id).first()
+    comment_detail = (
+        await data_base.scalars(select(Comment).filter_by(id=id, post_id=post_id))
+    ).first()
 
     return comment_detail
 
@@ -248,7 +356,6 @@ def update_comment(
         comment.is_visible = is_visible
 
     data_base.add(comment)
-    data_base.commit()
 
 
 def delete_comment(
@@ -267,4 +374,3 @@ def delete_comment(
         .first()
     )
     data_base.delete(comment)
-    data_base.commit()
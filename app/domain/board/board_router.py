@@ -5,12 +5,14 @@ from starlette import status
 
 from pydantic import ValidationError
 
-from database import data_base_dependency
+from database import data_base_dependency, async_data_base_dependency, UnitOfWorkRoute
 from domain.board import board_crud, board_schema
-from auth import current_user_payload, scope_checker
+from auth import current_user_payload, current_user_payload_async, scope_checker
 import v1_url
 
-router = APIRouter(prefix=v1_url.BOARD_PREFIX, tags=["board"])
+router = APIRouter(
+    prefix=v1_url.BOARD_PREFIX, tags=["board"], route_class=UnitOfWorkRoute
+)
 
 
 @router.post(v1_url.BOARD_CREATE_POST, status_code=status.HTTP_201_CREATED)
@@ -45,12 +47,12 @@ def create_post(
 
 
 @router.get(v1_url.BOARD_GET_POST, response_model=board_schema.ResponsePostRead)
-def get_post(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_post(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     schema: Annotated[board_schema.RequestPostRead, Depends()],
 ):
-    return board_crud.get_post_detail(
+    return await board_crud.get_post_detail_async(
         data_base=data_base,
         token=token,
         id=schema.id,
@@ -59,17 +61,20 @@ def get_post(
 
 
 @router.get(v1_url.BOARD_GET_POSTS, response_model=board_schema.ResponsePostsRead)
-def get_posts(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_posts(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     schema: Annotated[board_schema.RequestPostsRead, Depends()],
 ):
-    return board_crud.get_posts(
+    return await board_crud.get_posts_async(
         data_base=data_base,
         token=token,
         board_id=schema.board_id,
         skip=schema.skip,
         limit=schema.limit,
+        cursor=schema.cursor,
+        include_total=schema.include_total,
+        is_summary=schema.is_summary,
     )
 
 
@@ -135,12 +140,12 @@ def create_comment(
 
 
 @router.get(v1_url.BOARD_GET_COMMENT, response_model=board_schema.ResponseCommentRead)
-def get_comment(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_comment(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     schema: Annotated[board_schema.RequestCommentRead, Depends()],
 ):
-    return board_crud.get_comment_detail(
+    return await board_crud.get_comment_detail_async(
         data_base=data_base,
         token=token,
         id=schema.id,
@@ -149,17 +154,19 @@ def get_comment(
 
 
 @router.get(v1_url.BOARD_GET_COMMENTS, response_model=board_schema.ResponseCommentsRead)
-def get_comments(
-    token: current_user_payload,
-    data_base: data_base_dependency,
+async def get_comments(
+    token: current_user_payload_async,
+    data_base: async_data_base_dependency,
     schema: Annotated[board_schema.RequestCommentsRead, Depends()],
 ):
-    return board_crud.get_comments(
+    return await board_crud.get_comments_async(
         data_base=data_base,
         token=token,
         post_id=schema.post_id,
         skip=schema.skip,
         limit=schema.limit,
+        cursor=schema.cursor,
+        include_total=schema.include_total,
     )
 
 
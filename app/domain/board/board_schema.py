@@ -40,6 +40,11 @@ class RequestPostsRead(BaseModel):
     board_id: int = Field(ge=1)
     skip: int | None = Field(default=None, ge=0)
     limit: int | None = Field(default=None, ge=1)
+    # 이전 응답의 next_cursor. 있으면 skip은 사용하지 않는다.
+    cursor: str | None = Field(default=None, max_length=256)
+    include_total: bool = Field(default=True)
+    # True이면 content는 앞부분만 반환한다.
+    is_summary: bool = Field(default=False)
 
 
 class ResponsePostRead(BaseModel):
@@ -58,8 +63,9 @@ class ResponsePostRead(BaseModel):
 
 
 class ResponsePostsRead(BaseModel):
-    total: int = Field(ge=0)
+    total: int | None = Field(ge=0)
     posts: List["ResponsePostRead"]
+    next_cursor: str | None
 
 
 class RequestPostUpdate(BaseModel):
@@ -113,6 +119,8 @@ class RequestCommentsRead(BaseModel):
     post_id: int = Field(ge=1)
     skip: int | None = Field(default=None, ge=0)
     limit: int | None = Field(default=None, ge=1)
+    cursor: str | None = Field(default=None, max_length=256)
+    include_total: bool = Field(default=True)
 
 
 class ResponseCommentRead(BaseModel):
@@ -127,8 +135,9 @@ class ResponseCommentRead(BaseModel):
 
 
 class ResponseCommentsRead(BaseModel):
-    total: int = Field(ge=0)
+    total: int | None = Field(ge=0)
     comments: List["ResponseCommentRead"]
+    next_cursor: str | None
 
 
 class RequestCommentUpdate(BaseModel):
@@ -1,28 +1,81 @@
-from models import Post, PostViewIncrement
-from database import get_data_base_decorator
+import time
+
+from celery.utils.log import get_task_logger
+from sqlalchemy import delete, func, select
 from sqlalchemy.orm import Session
 
+from models import PostViewIncrement
+from database import get_data_base_decorator
+from config import get_settings
+from domain.board.board_crud import post_view_count_update
 from celery_app.celery import celery_app
 
 
+logger = get_task_logger(__name__)
+
+
 @celery_app.task(name="update_post_view_counts")
 @get_data_base_decorator
 def update_post_view_counts(data_base: Session):
-    post_view_increments = data_base.query(PostViewIncrement).all()
+    # 시작할 때의 마지막 id까지만 반영한다. 실행 중에 추가되는 row는 다음 실행에서 반영한다.
+    high_water_mark = data_base.scalar(select(func.max(PostViewIncrement.id)))
+    batch_size = get_settings().APP_POST_VIEW_AGGREGATE_BATCH_SIZE
+    report = {"increments": 0, "posts": 0, "batch_milliseconds": []}
+    start = time.perf_counter()
 
-    post_view_counts = dict()
-    for post_view_increment in post_view_increments:
-        post_view_counts[post_view_increment.post_id] = (
-            post_view_counts.get(post_view_increment.post_id, 0) + 1
+    while high_water_mark is not None:
+        batch_start = time.perf_counter()
+
+        # SQLite의 쓰기 lock을 오래 잡지 않도록 batch_size개의 id 범위씩 commit한다.
+        batch_ids = (
+            select(PostViewIncrement.id)
+            .where(PostViewIncrement.id <= high_water_mark)
+            .order_by(PostViewIncrement.id)
+            .limit(batch_size)
+            .subquery()
         )
+        batch_high_water_mark = data_base.scalar(select(func.max(batch_ids.c.id)))
+        if batch_high_water_mark is None:
+            break
+
+        post_view_counts = data_base.execute(
+            select(PostViewIncrement.post_id, func.count())
+            .where(PostViewIncrement.id <= batch_high_water_mark)
+            .group_by(PostViewIncrement.post_id)
+        ).all()
 
-    for post_id, count in post_view_counts.items():
-        data_base.query(Post).filter(Post.id == post_id).update(
-            {Post.number_of_view: Post.number_of_view + count},
-            synchronize_session=False,
+        data_base.execute(
+            post_view_count_update,
+            [
+                {"post_id": post_id, "count": count}
+                for post_id, count in post_view_counts
+            ],
         )
+        deleted = data_base.execute(
+            delete(PostViewIncrement).where(
+                PostViewIncrement.id <= batch_high_water_mark
+            ),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        data_base.commit()
+
+        report["increments"] += deleted
+        report["posts"] += len(post_view_counts)
+        report["batch_milliseconds"].append(
+            round((time.perf_counter() - batch_start) * 1000, 3)
+        )
+
+        if batch_high_water_mark >= high_water_mark:
+            break
 
-    for post_view_increment in post_view_increments:
-        data_base.delete(post_view_increment)
+    seconds = time.perf_counter() - start
+    logger.info(
+        "post_view_increment : %d rows of %d posts in %d batches (%.1f rows/s) %s ms",
+        report["increments"],
+        report["posts"],
+        len(report["batch_milliseconds"]),
+        report["increments"] / seconds if seconds else 0,
+        report["batch_milliseconds"],
+    )
 
-    data_base.commit()
+    return report
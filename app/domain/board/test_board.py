@@ -1,20 +1,23 @@
 from pytest import MonkeyPatch
 import pytest
 import json
+import base64
 
 from fastapi.testclient import TestClient
 from httpx import Response
 
-
-from main import app
 from domain.admin.admin_crud import create_admin_with_terminal
-from models import User, Board, Post, Comment
-from database import session_local
+from models import User, Board, Post, Comment, PostViewIncrement
+from database import session_local, run_with_write_session
+from domain.board.board_crud import flush_post_view_counts
+from view_counter import ShardedCounter
+from domain.board.tasks import update_post_view_counts
+from config import get_settings
 from auth import validate_and_decode_user_access_token
 import v1_url
 from domain.user.test_user import user_test_methods
 from domain.admin.test_admin import admin_test_methods
-from test_main import main_test_methods
+from test_main import app, main_test_methods
 
 
 client = TestClient(app)
@@ -259,7 +262,15 @@ class PostTestMethods:
 
         data_base.close()
 
-    def get_posts(self, board_id, post_skip, post_limit, access_token: str):
+    def get_posts(
+        self,
+        board_id,
+        post_skip,
+        post_limit,
+        access_token: str,
+        post_cursor=None,
+        post_is_summary=None,
+    ):
         params = {}
         if board_id != None:
             params["board_id"] = board_id
@@ -267,6 +278,10 @@ class PostTestMethods:
             params["skip"] = post_skip
         if post_limit != None:
             params["limit"] = post_limit
+        if post_cursor != None:
+            params["cursor"] = post_cursor
+        if post_is_summary != None:
+            params["is_summary"] = post_is_summary
 
         response_test = client.get(
             URL_BOARD_GET_POSTS,
@@ -454,7 +469,13 @@ class CommentTestMethods:
         data_base.close()
 
     def get_comments(
-        self, *, post_id, comment_skip=None, comment_limit=None, access_token: str
+        self,
+        *,
+        post_id,
+        comment_skip=None,
+        comment_limit=None,
+        comment_include_total=None,
+        access_token: str,
     ):
         params = {}
         if post_id != None:
@@ -463,6 +484,8 @@ class CommentTestMethods:
             params["skip"] = comment_skip
         if comment_limit != None:
             params["limit"] = comment_limit
+        if comment_include_total != None:
+            params["include_total"] = comment_include_total
 
         response_test = client.get(
             URL_BOARD_GET_COMMENTS,
@@ -653,6 +676,169 @@ class TestPost:
         )
         post_test_methods.get_posts_test(post_columns, response_test=response_test)
 
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_get_posts_cursor.json")
+    )
+    def test_get_posts_cursor(self, pn, name, password1, post_count, post_limit):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+        board_id = id_list_dict[ID_DICT_BOARD_ID][0]
+
+        for i in range(post_count):
+            response_test = post_test_methods.create_post(
+                f"cursor{i}", f"cursor{i}", board_id, False, True, access_token
+            )
+            assert response_test.status_code == 201
+
+        response_test = post_test_methods.get_posts(
+            board_id=board_id, post_skip=None, post_limit=100, access_token=access_token
+        )
+        post_id_list = [post.get("id") for post in response_test.json().get("posts")]
+
+        # cursor로 끝까지 넘긴 결과가 skip/limit으로 한 번에 가져온 결과와 같아야 한다.
+        post_id_list_cursor = []
+        post_cursor = None
+        while True:
+            response_test = post_test_methods.get_posts(
+                board_id=board_id,
+                post_skip=None,
+                post_limit=post_limit,
+                access_token=access_token,
+                post_cursor=post_cursor,
+            )
+            assert response_test.status_code == 200
+
+            response_test_json: dict = response_test.json()
+            assert len(response_test_json.get("posts")) <= post_limit
+            post_id_list_cursor += [
+                post.get("id") for post in response_test_json.get("posts")
+            ]
+
+            post_cursor = response_test_json.get("next_cursor")
+            if post_cursor == None:
+                break
+
+        assert len(post_id_list) > post_limit
+        assert post_id_list_cursor == post_id_list
+
+        response_test = post_test_methods.get_posts(
+            board_id=board_id,
+            post_skip=None,
+            post_limit=post_limit,
+            access_token=access_token,
+            post_cursor="invalid",
+        )
+        assert response_test.status_code == 400
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_get_posts_invalid_cursor.json")
+    )
+    def test_get_posts_invalid_cursor(self, pn, name, password1, post_cursor_values):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+        board_id = id_list_dict[ID_DICT_BOARD_ID][0]
+
+        # 형식은 맞지만 칼럼 type과 다른 값이 들어있는 cursor
+        post_cursor = base64.urlsafe_b64encode(
+            json.dumps(post_cursor_values).encode()
+        ).decode()
+
+        response_test = post_test_methods.get_posts(
+            board_id=board_id,
+            post_skip=None,
+            post_limit=1,
+            access_token=access_token,
+            post_cursor=post_cursor,
+        )
+        assert response_test.status_code == 400
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_get_posts_summary.json")
+    )
+    def test_get_posts_summary(self, pn, name, password1, post_content, post_columns):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+        board_id = id_list_dict[ID_DICT_BOARD_ID][0]
+
+        response_test = post_test_methods.create_post(
+            "summary", post_content, board_id, False, True, access_token
+        )
+        assert response_test.status_code == 201
+
+        response_test = post_test_methods.get_posts(
+            board_id=board_id, post_skip=None, post_limit=100, access_token=access_token
+        )
+        posts = response_test.json().get("posts")
+
+        response_test = post_test_methods.get_posts(
+            board_id=board_id,
+            post_skip=None,
+            post_limit=100,
+            access_token=access_token,
+            post_is_summary=True,
+        )
+        post_test_methods.get_posts_test(post_columns, response_test=response_test)
+        posts_summary = response_test.json().get("posts")
+
+        preview_length = get_settings().APP_CONTENT_PREVIEW_LENGTH
+        assert len(posts_summary) == len(posts)
+        for post, post_summary in zip(posts, posts_summary):
+            assert post_summary.get("content") == post.get("content")[:preview_length]
+            post_summary["content"] = post.get("content")
+            assert post_summary == post
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_get_posts_query_budget.json")
+    )
+    def test_get_posts_query_budget(
+        self, pn, name, password1, posts_params, query_budget
+    ):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+        # 다른 test의 id 순서가 바뀌지 않도록 iterator를 사용하지 않는다.
+        board_id = id_list_dict[ID_DICT_BOARD_ID][0]
+
+        response_test = post_test_methods.get_posts(
+            board_id=board_id, **posts_params, access_token=access_token
+        )
+        assert response_test.status_code == 200
+        main_test_methods.check_query_budget(response_test, query_budget)
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_slow_query_log.json")
+    )
+    def test_slow_query_log(self, pn, name, password1, posts_params, caller):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+        board_id = id_list_dict[ID_DICT_BOARD_ID][0]
+
+        # 모든 SQL이 기록되도록 기준 시간을 낮춘다.
+        settings = get_settings()
+        slow_query_milliseconds = settings.APP_SLOW_QUERY_MILLISECONDS
+        settings.APP_SLOW_QUERY_MILLISECONDS = 0.000001
+        try:
+            response_test = post_test_methods.get_posts(
+                board_id=board_id, **posts_params, access_token=access_token
+            )
+        finally:
+            settings.APP_SLOW_QUERY_MILLISECONDS = slow_query_milliseconds
+
+        assert response_test.status_code == 200
+
+        with open(settings.APP_SLOW_QUERY_LOG_PATH, "r", encoding="UTF-8") as f:
+            slow_query = json.loads(f.readlines()[-1])
+
+        assert slow_query.get("caller") == caller
+        assert slow_query.get("milliseconds") > 0
+        assert "FROM post" in slow_query.get("statement")
+        assert slow_query.get("parameters") == ["int", "int", "int"]
+        assert len(slow_query.get("plan")) > 0
+
     @pytest.mark.parametrize(
         **parameter_data_loader("domain/board/test_update_post.json")
     )
@@ -805,6 +991,24 @@ class TestComment:
             comment_columns, response_test=response_test
         )
 
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_get_comments_query_budget.json")
+    )
+    def test_get_comments_query_budget(
+        self, pn, name, password1, comments_params, query_budget
+    ):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+
+        post_id, comment_id = id_list_dict[ID_DICT_COMMENT_ID][0]
+
+        response_test = comment_test_methods.get_comments(
+            post_id=post_id, **comments_params, access_token=access_token
+        )
+        assert response_test.status_code == 200
+        main_test_methods.check_query_budget(response_test, query_budget)
+
     @pytest.mark.parametrize(
         **parameter_data_loader("domain/board/test_update_comment.json")
     )
@@ -850,3 +1054,179 @@ class TestComment:
         comment_test_methods.delete_comment_test(
             comment_id=comment_id, post_id=post_id, response_test=response_test
         )
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_post_view_counter.json")
+    )
+    def test_post_view_counter(self, pn, name, password1, view_count):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+
+        board_id, post_id = id_list_dict[ID_DICT_POST_ID][0]
+
+        # 앞선 test에서 센 조회수를 먼저 반영한다.
+        run_with_write_session(flush_post_view_counts)
+        data_base = session_local()
+        increments = data_base.query(PostViewIncrement).count()
+        data_base.close()
+
+        number_of_view = post_test_methods.get_post(
+            post_id, board_id, access_token=access_token
+        ).json()["number_of_view"]
+
+        # 조회는 메모리에서만 세고 flush 전까지는 DB에 쓰지 않는다.
+        for _ in range(view_count):
+            response_test = post_test_methods.get_post(
+                post_id, board_id, access_token=access_token
+            )
+            assert response_test.status_code == 200
+            assert response_test.json()["number_of_view"] == number_of_view
+
+        assert run_with_write_session(flush_post_view_counts) == 1
+
+        data_base = session_local()
+        post = data_base.query(Post).filter_by(id=post_id).first()
+        assert post.number_of_view == number_of_view + view_count + 1
+        assert data_base.query(PostViewIncrement).count() == increments
+        data_base.close()
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_post_view_counter_shards.json")
+    )
+    def test_post_view_counter_shards(self, pn, shard_count, post_count):
+        counter = ShardedCounter(shard_count)
+
+        # 한 thread(event loop)에서 세더라도 게시글마다 다른 shard에 나눠 담는다.
+        for post_id in range(1, post_count + 1):
+            counter.add(post_id)
+            counter.add(post_id)
+
+        assert all(counter.shards)
+        assert len(counter) == post_count
+        assert counter.drain() == {post_id: 2 for post_id in range(1, post_count + 1)}
+        assert len(counter) == 0
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_update_post_view_counts.json")
+    )
+    def test_update_post_view_counts(self, pn, name, password1, view_count, batch_size):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+
+        board_id, post_id = id_list_dict[ID_DICT_POST_ID][0]
+
+        monkeypatch = MonkeyPatch()
+        monkeypatch.setattr(get_settings(), "APP_POST_VIEW_INCREMENT_ENABLED", True)
+        monkeypatch.setattr(
+            get_settings(), "APP_POST_VIEW_AGGREGATE_BATCH_SIZE", batch_size
+        )
+        try:
+            run_with_write_session(flush_post_view_counts)
+            update_post_view_counts(None)
+            data_base = session_local()
+            number_of_view = (
+                data_base.query(Post).filter_by(id=post_id).first().number_of_view
+            )
+            data_base.close()
+
+            # 조회마다 PostViewIncrement row가 저장된다.
+            for _ in range(view_count):
+                response_test = post_test_methods.get_post(
+                    post_id, board_id, access_token=access_token
+                )
+                assert response_test.status_code == 200
+
+            report = update_post_view_counts(None)
+        finally:
+            monkeypatch.undo()
+
+        # batch_size개씩 나눠서 반영하고 반영한 row는 삭제한다.
+        assert report["increments"] == view_count
+        assert len(report["batch_milliseconds"]) == -(-view_count // batch_size)
+
+        data_base = session_local()
+        post = data_base.query(Post).filter_by(id=post_id).first()
+        assert post.number_of_view == number_of_view + view_count
+        assert data_base.query(PostViewIncrement).count() == 0
+        data_base.close()
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_aggregate_counters.json")
+    )
+    def test_aggregate_counters(self, pn, name, password1):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+
+        # 생성/삭제를 거친 뒤에도 유지되는 개수가 COUNT(*)와 같아야 한다.
+        data_base = session_local()
+        for board in data_base.query(Board).all():
+            assert board.number_of_post == (
+                data_base.query(Post).filter_by(board_id=board.id).count()
+            )
+        for post in data_base.query(Post).all():
+            assert post.number_of_comment == (
+                data_base.query(Comment).filter_by(post_id=post.id).count()
+            )
+        data_base.close()
+
+        post_id, comment_id = id_list_dict[ID_DICT_COMMENT_ID][0]
+
+        response_test = comment_test_methods.get_comments(
+            post_id=post_id, access_token=access_token
+        )
+        assert response_test.status_code == 200
+        assert response_test.json().get("total") == len(
+            response_test.json().get("comments")
+        )
+
+        response_test = comment_test_methods.get_comments(
+            post_id=post_id, comment_include_total=False, access_token=access_token
+        )
+        assert response_test.status_code == 200
+        assert response_test.json().get("total") == None
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/board/test_aggregate_counters.json")
+    )
+    def test_aggregate_counters_keep_update_date(self, pn, name, password1):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+        board_id = id_list_dict[ID_DICT_BOARD_ID][0]
+
+        response_test = post_test_methods.create_post(
+            "counter", "counter", board_id, False, True, access_token
+        )
+        assert response_test.status_code == 201
+        post_id = response_test.json().get("id")
+
+        data_base = session_local()
+        post = data_base.get(Post, post_id)
+        update_date = post.update_date
+        number_of_comment = post.number_of_comment
+
+        # 댓글 생성/삭제는 게시글의 개수만 바꾸고 수정 시각은 바꾸지 않는다.
+        response_test = comment_test_methods.create_comment(
+            "counter", post_id, False, True, access_token
+        )
+        assert response_test.status_code == 201
+        comment_id = response_test.json().get("id")
+
+        data_base.expire_all()
+        post = data_base.get(Post, post_id)
+        assert post.number_of_comment == number_of_comment + 1
+        assert post.update_date == update_date
+
+        response_test = comment_test_methods.delete_comment(
+            comment_id, post_id, access_token
+        )
+        assert response_test.status_code == 204
+
+        data_base.expire_all()
+        post = data_base.get(Post, post_id)
+        assert post.number_of_comment == number_of_comment
+        assert post.update_date == update_date
+        data_base.close()
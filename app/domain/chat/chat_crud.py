@@ -4,9 +4,28 @@ from typing import Any, Dict
 from fastapi import HTTPException, WebSocket
 from starlette import status
 
+from sqlalchemy import select, func, bindparam
+
 from models import Chat, ChatSession, UserChatSessionTable
-from auth import current_user_payload
-from database import data_base_dependency
+from auth import current_user_payload, current_user_payload_async
+from pagination import paginate, get_page, get_summary_columns
+from database import data_base_dependency, async_data_base_dependency
+
+
+# 자주 호출되는 조회는 statement를 미리 만들어 두고 값만 바꿔 실행한다. (compile 결과를 재사용)
+chats_select = (
+    select(Chat)
+    .where(Chat.chat_session_id == bindparam("chat_session_id"))
+    .order_by(Chat.create_date.asc(), Chat.id.asc())
+)
+chats_summary_select = (
+    select(*get_summary_columns(Chat, Chat.content))
+    .where(Chat.chat_session_id == bindparam("chat_session_id"))
+    .order_by(Chat.create_date.asc(), Chat.id.asc())
+)
+number_of_chat_select = select(ChatSession.number_of_chat).where(
+    ChatSession.id == bindparam("chat_session_id")
+)
 
 
 def create_chatsession(
@@ -25,26 +44,30 @@ def create_chatsession(
         is_closed=is_closed,
     )
     data_base.add(chat_session)
-    data_base.commit()
+    data_base.flush()
     
     return chat_session.id
 
 
-def get_chatsession(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_chatsession_async(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     chatting_room_id: int,
 ):
-    chat_session = data_base.query(ChatSession).filter_by(id=chatting_room_id).first()
+    chat_session = (
+        await data_base.scalars(select(ChatSession).filter_by(id=chatting_room_id))
+    ).first()
     return chat_session
 
 
-def get_chatsessions(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_chatsessions_async(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     user_create_id: int | None,
     skip: int | None,
     limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
     filter_kwargs = {}
 
@@ -60,13 +83,30 @@ def get_chatsessions(
         filter_kwargs["user_create_id"] = user_create_id
 
     chat_sessions = (
-        data_base.query(ChatSession)
+        select(ChatSession)
         .filter_by(**filter_kwargs)
         .order_by(ChatSession.create_date.asc(), ChatSession.id.asc())
     )
-    total = chat_sessions.count()
-    chat_sessions = chat_sessions.offset(skip).limit(limit).all()
-    return {"total": total, "chat_sessions": chat_sessions}
+    total = None
+    if include_total:
+        total = await data_base.scalar(
+            select(func.count()).select_from(chat_sessions.subquery())
+        )
+    order_columns = [ChatSession.create_date, ChatSession.id]
+    chat_sessions, next_cursor = get_page(
+        (
+            await data_base.scalars(
+                paginate(chat_sessions, order_columns, skip, limit, cursor)
+            )
+        ).all(),
+        order_columns,
+        limit,
+    )
+    return {
+        "total": total,
+        "chat_sessions": chat_sessions,
+        "next_cursor": next_cursor,
+    }
 
 
 def update_chatsession(
@@ -90,7 +130,6 @@ def update_chatsession(
         chat_session.is_closed = is_closed
 
     data_base.add(chat_session)
-    data_base.commit()
 
 
 def delete_chatsession(
@@ -100,7 +139,6 @@ def delete_chatsession(
 ):
     chatsession = data_base.query(ChatSession).filter_by(id=id).first()
     data_base.delete(chatsession)
-    data_base.commit()
 
 
 def create_chat(
@@ -115,32 +153,87 @@ def create_chat(
         content=content,
     )
     data_base.add(chat)
-    data_base.commit()
+    data_base.flush()
 
     return chat.id
 
+
 def get_chats(
     data_base: data_base_dependency,
     token: current_user_payload,
     chat_session_id: int,
     skip: int | None,
     limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
+    is_summary: bool = False,
 ):
-    filter_kwargs = {"chat_session_id": chat_session_id}
+    parameters = {"chat_session_id": chat_session_id}
 
     if skip == None:
         skip = 0
     if limit == None:
         limit = 10
 
-    chats = (
-        data_base.query(Chat)
-        .filter_by(**filter_kwargs)
-        .order_by(Chat.create_date.asc(), Chat.id.asc())
+    total = None
+    if include_total:
+        total = data_base.scalar(number_of_chat_select, parameters) or 0
+    order_columns = [Chat.create_date, Chat.id]
+    chats = data_base.execute(
+        paginate(
+            chats_summary_select if is_summary else chats_select,
+            order_columns,
+            skip,
+            limit,
+            cursor,
+        ),
+        parameters,
+    )
+    chats, next_cursor = get_page(
+        chats.all() if is_summary else chats.scalars().all(), order_columns, limit
+    )
+    if is_summary:
+        chats = [chat._asdict() for chat in chats]
+    return {"total": total, "chats": chats, "next_cursor": next_cursor}
+
+
+async def get_chats_async(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
+    chat_session_id: int,
+    skip: int | None,
+    limit: int | None,
+    cursor: str | None = None,
+    include_total: bool = True,
+    is_summary: bool = False,
+):
+    parameters = {"chat_session_id": chat_session_id}
+
+    if skip == None:
+        skip = 0
+    if limit == None:
+        limit = 10
+
+    total = None
+    if include_total:
+        total = await data_base.scalar(number_of_chat_select, parameters) or 0
+    order_columns = [Chat.create_date, Chat.id]
+    chats = await data_base.execute(
+        paginate(
+            chats_summary_select if is_summary else chats_select,
+            order_columns,
+            skip,
+            limit,
+            cursor,
+        ),
+        parameters,
+    )
+    chats, next_cursor = get_page(
+        chats.all() if is_summary else chats.scalars().all(), order_columns, limit
     )
-    total = chats.count()
-    chats = chats.offset(skip).limit(limit).all()
-    return {"total": total, "chats": chats}
+    if is_summary:
+        chats = [chat._asdict() for chat in chats]
+    return {"total": total, "chats": chats, "next_cursor": next_cursor}
 
 
 def update_chat(
@@ -167,7 +260,6 @@ def update_chat(
         chat.is_visible = is_visible
 
     data_base.add(chat)
-    data_base.commit()
 
 
 def delete_chat(
@@ -186,7 +278,6 @@ def delete_chat(
         .first()
     )
     data_base.delete(chat)
-    data_base.commit()
 
 
 class ConnectionManager:
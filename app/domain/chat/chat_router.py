@@ -5,12 +5,20 @@ from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisco
 from fastapi.responses import HTMLResponse
 from starlette import status
 
-from database import data_base_dependency
+from database import (
+    data_base_dependency,
+    async_data_base_dependency,
+    async_session_local,
+    run_with_write_session_async,
+    UnitOfWorkRoute,
+)
 from domain.chat import chat_crud, chat_schema
-from auth import current_user_payload
+from auth import current_user_payload, current_user_payload_async
 import v1_url
 
-router = APIRouter(prefix=v1_url.CHAT_PREFIX, tags=["chat"])
+router = APIRouter(
+    prefix=v1_url.CHAT_PREFIX, tags=["chat"], route_class=UnitOfWorkRoute
+)
 
 
 manager = chat_crud.ConnectionManager()
@@ -37,12 +45,12 @@ def create_chatsession(
 
 
 @router.get(v1_url.CHAT_GET_CHATSESSION)
-def get_chatsession(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_chatsession(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     schema: Annotated[chat_schema.RequestChatSessionRead, Depends()],
 ):
-    return chat_crud.get_chatsession(
+    return await chat_crud.get_chatsession_async(
         data_base=data_base,
         token=token,
         chatting_room_id=schema.chatting_room_id,
@@ -50,17 +58,19 @@ def get_chatsession(
 
 
 @router.get(v1_url.CHAT_GET_CHATSESSIONS)
-def get_chatsessions(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_chatsessions(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     schema: Annotated[chat_schema.RequestChatSessionsRead, Depends()],
 ):
-    return chat_crud.get_chatsessions(
+    return await chat_crud.get_chatsessions_async(
         data_base=data_base,
         token=token,
         user_create_id=schema.user_create_id,
         skip=schema.skip,
         limit=schema.limit,
+        cursor=schema.cursor,
+        include_total=schema.include_total,
     )
 
 
@@ -111,17 +121,20 @@ def create_chat(
 
 
 @router.get(v1_url.CHAT_GET_CHATS)
-def get_chats(
-    data_base: data_base_dependency,
-    token: current_user_payload,
+async def get_chats(
+    data_base: async_data_base_dependency,
+    token: current_user_payload_async,
     schema: Annotated[chat_schema.RequestChatsRead, Depends()],
 ):
-    return chat_crud.get_chats(
+    return await chat_crud.get_chats_async(
         data_base=data_base,
         token=token,
         chat_session_id=schema.chat_session_id,
         skip=schema.skip,
         limit=schema.limit,
+        cursor=schema.cursor,
+        include_total=schema.include_total,
+        is_summary=schema.is_summary,
     )
 
 
@@ -158,8 +171,7 @@ def delete_chat(
 @router.websocket(v1_url.CHAT_WEBSOCKET+"/{chatting_room_id}/{user_id}")
 async def websocket_test_endpoint(
     websocket: WebSocket,
-    data_base: data_base_dependency,
-    token: current_user_payload,
+    token: current_user_payload_async,
     chatting_room_id: int,
     user_id: int,
 ):
@@ -175,13 +187,17 @@ async def websocket_test_endpoint(
                         json_encoder.encode(o={"user_join": f"{t_user_id}"}), websocket
                     )
 
-            for chat_query in chat_crud.get_chats(
-                data_base=data_base,
-                token=token,
-                chat_session_id=chatting_room_id,
-                skip=0,
-                limit=0,
-            ).get("chats"):
+            # 연결이 유지되는 동안 session을 잡고 있지 않도록 필요할 때만 짧게 연다.
+            async with async_session_local() as data_base:
+                chats = await chat_crud.get_chats_async(
+                    data_base=data_base,
+                    token=token,
+                    chat_session_id=chatting_room_id,
+                    skip=0,
+                    limit=0,
+                )
+
+            for chat_query in chats.get("chats"):
                 await manager.send_personal_message(
                     json_encoder.encode(o={"message": f"{chat_query.content}"}),
                     websocket,
@@ -201,8 +217,8 @@ async def websocket_test_endpoint(
                 data = await websocket.receive_text()
                 data = json_decoder.decode(data)
                 message = data["message"]
-                chat_crud.create_chat(
-                    data_base=data_base,
+                await run_with_write_session_async(
+                    chat_crud.create_chat,
                     token=token,
                     content=message,
                     chat_session_id=chatting_room_id,
@@ -25,6 +25,8 @@ class RequestChatSessionsRead(BaseModel):
     user_create_id: int | None = Field(default=None,ge=1)
     skip: int | None = Field(default=None, ge=0)
     limit: int | None = Field(default=None, ge=0)
+    cursor: str | None = Field(default=None, max_length=256)
+    include_total: bool = Field(default=True)
 
 
 class RequestChatSessionUpdate(BaseModel):
@@ -61,6 +63,10 @@ class RequestChatsRead(BaseModel):
     chat_session_id: int = Field(ge=1)
     skip: int | None = Field(default=None, ge=0)
     limit: int | None = Field(default=None, ge=0)
+    cursor: str | None = Field(default=None, max_length=256)
+    include_total: bool = Field(default=True)
+    # True이면 content는 앞부분만 반환한다.
+    is_summary: bool = Field(default=False)
 
 
 class RequestChatUpdate(BaseModel):
@@ -6,15 +6,16 @@ from fastapi.testclient import TestClient
 from httpx import Response
 from fastapi import WebSocket
 
-from main import app
 from domain.admin.admin_crud import create_admin_with_terminal
 from models import User, Chat, ChatSession
 from database import session_local
+from domain.chat.chat_crud import get_chats
+from config import get_settings
 from auth import validate_and_decode_user_access_token
 import v1_url
 from domain.user.test_user import user_test_methods
 from domain.admin.test_admin import admin_test_methods
-from test_main import main_test_methods
+from test_main import app, main_test_methods
 
 
 client = TestClient(app)
@@ -414,7 +415,13 @@ class ChatTestMethods:
         data_base.close()
 
     def get_chats(
-        self, *, chat_session_id, chat_skip=None, chat_limit=None, access_token: str
+        self,
+        *,
+        chat_session_id,
+        chat_skip=None,
+        chat_limit=None,
+        chat_is_summary=None,
+        access_token: str,
     ):
         params = {}
         if chat_session_id != None:
@@ -423,6 +430,8 @@ class ChatTestMethods:
             params["skip"] = chat_skip
         if chat_limit != None:
             params["limit"] = chat_limit
+        if chat_is_summary != None:
+            params["is_summary"] = chat_is_summary
 
         response_test = client.get(
             URL_CHAT_GET_CHATS,
@@ -773,6 +782,55 @@ class TestChat:
         )
         chat_test_methods.get_chats_test(chat_columns, response_test=response_test)
 
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/chat/test_get_chats_summary.json")
+    )
+    def test_get_chats_summary(self, pn, name, password1, chat_content, chat_columns):
+        response_login = user_test_methods.login_user(name, password1)
+        response_login_json: dict = response_login.json()
+        access_token = response_login_json.get("access_token")
+        chat_session_id = id_list_dict[ID_DICT_CHATSESSION_ID][0]
+
+        response_test = chat_test_methods.create_chat(
+            chat_content, chat_session_id, access_token=access_token
+        )
+        assert response_test.status_code == 201
+
+        response_test = chat_test_methods.get_chats(
+            chat_session_id=chat_session_id, chat_limit=100, access_token=access_token
+        )
+        chats = response_test.json().get("chats")
+
+        response_test = chat_test_methods.get_chats(
+            chat_session_id=chat_session_id,
+            chat_limit=100,
+            chat_is_summary=True,
+            access_token=access_token,
+        )
+        chat_test_methods.get_chats_test(chat_columns, response_test=response_test)
+        chats_summary = response_test.json().get("chats")
+
+        preview_length = get_settings().APP_CONTENT_PREVIEW_LENGTH
+        assert len(chats_summary) == len(chats)
+        for chat, chat_summary in zip(chats, chats_summary):
+            assert chat_summary.get("content") == chat.get("content")[:preview_length]
+
+        # chat_router_debug가 사용하는 sync get_chats도 같은 요약을 반환해야 한다.
+        data_base = session_local()
+        chats_summary_sync = get_chats(
+            data_base=data_base,
+            token=None,
+            chat_session_id=chat_session_id,
+            skip=None,
+            limit=100,
+            is_summary=True,
+        ).get("chats")
+        data_base.close()
+
+        assert [chat.get("content") for chat in chats_summary_sync] == [
+            chat.get("content") for chat in chats_summary
+        ]
+
     @pytest.mark.parametrize(
         **parameter_data_loader("domain/chat/test_update_chat.json")
     )
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import time
+
+from celery.utils.log import get_task_logger
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+
+from models import JWTAccessTokenBlackList, JWTRefreshTokenList
+from database import get_data_base_decorator
+from config import get_settings
+from celery_app.celery import celery_app
+
+
+logger = get_task_logger(__name__)
+
+
+def delete_expired_rows(data_base: Session, model, primary_keys: list, now: datetime):
+    # SQLite의 쓰기 lock을 오래 잡지 않도록 batch 단위로 commit한다.
+    batch_size = get_settings().APP_JWT_PURGE_BATCH_SIZE
+    report = {"deleted": 0, "batch_milliseconds": []}
+
+    while True:
+        start = time.perf_counter()
+
+        expired_primary_keys = (
+            select(*primary_keys).where(model.expired_date <= now).limit(batch_size)
+        )
+        deleted = data_base.execute(
+            delete(model).where(tuple_(*primary_keys).in_(expired_primary_keys)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        data_base.commit()
+
+        if not deleted:
+            break
+
+        report["deleted"] += deleted
+        report["batch_milliseconds"].append(
+            round((time.perf_counter() - start) * 1000, 3)
+        )
+
+        if deleted < batch_size:
+            break
+
+    logger.info(
+        "%s : %d rows deleted in %d batches %s ms",
+        model.__tablename__,
+        report["deleted"],
+        len(report["batch_milliseconds"]),
+        report["batch_milliseconds"],
+    )
+
+    return report
+
+
+@celery_app.task(name="delete_expired_jwt_tokens")
+@get_data_base_decorator
+def delete_expired_jwt_tokens(data_base: Session):
+    now = datetime.now()
+    # refresh로 마지막에 발급한 access token이 만료된 뒤에 refresh token row를 지운다.
+    access_token_expired = now - timedelta(minutes=get_settings().APP_JWT_EXPIRE_MINUTES)
+
+    return {
+        JWTAccessTokenBlackList.__tablename__: delete_expired_rows(
+            data_base,
+            JWTAccessTokenBlackList,
+            [JWTAccessTokenBlackList.user_id, JWTAccessTokenBlackList.access_token],
+            now,
+        ),
+        JWTRefreshTokenList.__tablename__: delete_expired_rows(
+            data_base,
+            JWTRefreshTokenList,
+            [JWTRefreshTokenList.user_id],
+            access_token_expired,
+        ),
+    }
@@ -1,15 +1,30 @@
+import os
 import pytest
+from pytest import MonkeyPatch
 import json
+from datetime import datetime, timedelta
 
 from fastapi.testclient import TestClient
 from httpx import Response
 
-from main import app
-from models import User
+from models import User, JWTAccessTokenBlackList, JWTRefreshTokenList
+import database
 from database import session_local
-from auth import validate_and_decode_user_access_token
+from auth import (
+    validate_and_decode_user_access_token,
+    jwt_decode_cache,
+    login_rate_limiter,
+    password_hash_executor,
+    user_token_epoch_cache,
+    bump_user_token_epoch,
+    ban_access_token,
+    access_token_revocation_cache,
+    get_unverified_token_claims,
+)
+from config import get_settings
+from domain.user.tasks import delete_expired_jwt_tokens
 import v1_url
-from test_main import main_test_methods
+from test_main import app, main_test_methods
 
 client = TestClient(app)
 
@@ -39,6 +54,11 @@ url_dict = {
         v1_url.USER_PREFIX,
         v1_url.USER_UPDATE_USER_PASSWORD,
     ],
+    "URL_USER_LOGOUT_USER": [
+        v1_url.API_V1_ROUTER_PREFIX,
+        v1_url.USER_PREFIX,
+        v1_url.USER_LOGOUT_USER,
+    ],
 }
 
 
@@ -47,6 +67,7 @@ URL_USER_LOGIN_USER = "".join(url_dict.get("URL_USER_LOGIN_USER"))
 URL_USER_GET_USER_DETAIL = "".join(url_dict.get("URL_USER_GET_USER_DETAIL"))
 URL_USER_UPDATE_USER_DETAIL = "".join(url_dict.get("URL_USER_UPDATE_USER_DETAIL"))
 URL_USER_UPDATE_USER_PASSWORD = "".join(url_dict.get("URL_USER_UPDATE_USER_PASSWORD"))
+URL_USER_LOGOUT_USER = "".join(url_dict.get("URL_USER_LOGOUT_USER"))
 
 
 def parameter_data_loader(path):
@@ -176,6 +197,44 @@ class UserTestMethods:
 
         data_base.close()
 
+    def relogin_user_test(self, access_token_old: str, response_test: Response):
+        assert response_test.status_code == 200
+        access_token_new = response_test.json().get("access_token")
+
+        assert self.get_user_detail(access_token_old).status_code == 401
+        assert self.get_user_detail(access_token_new).status_code == 200
+
+    def jwt_decode_cache_test(self, access_token: str):
+        assert self.get_user_detail(access_token).status_code == 200
+        hits = jwt_decode_cache.stats().get("hits")
+
+        assert self.get_user_detail(access_token).status_code == 200
+        assert jwt_decode_cache.stats().get("hits") == hits + 1
+
+    def login_rate_limit_test(self, name, password1, password_wrong):
+        for _ in range(get_settings().APP_LOGIN_RATE_LIMIT_USER_BURST):
+            assert self.login_user(name, password_wrong).status_code == 401
+
+        # token이 모두 소모되면 비밀번호가 맞더라도 bcrypt 계산 전에 거부한다.
+        assert self.login_user(name, password_wrong).status_code == 429
+        assert self.login_user(name, password1).status_code == 429
+
+        login_rate_limiter.clear()
+        assert self.login_user(name, password1).status_code == 200
+
+    def login_rate_limit_refund_test(self, name, password1, password_wrong):
+        # 비밀번호 확인 작업이 가득 차 503으로 거부된 로그인은 시도 횟수로 세지 않는다.
+        monkeypatch = MonkeyPatch()
+        monkeypatch.setattr(password_hash_executor, "max_workers", 0)
+        monkeypatch.setattr(password_hash_executor, "max_queue_size", 0)
+        try:
+            for _ in range(get_settings().APP_LOGIN_RATE_LIMIT_USER_BURST + 1):
+                assert self.login_user(name, password_wrong).status_code == 503
+        finally:
+            monkeypatch.undo()
+
+        assert self.login_user(name, password1).status_code == 200
+
     def get_user_detail(self, access_token: str):
         response_test = client.get(
             URL_USER_GET_USER_DETAIL,
@@ -262,6 +321,139 @@ class UserTestMethods:
 
         data_base.close()
 
+    def token_epoch_shared_cache_test(self, name, password1):
+        access_token = self.login_user(name, password1).json().get("access_token")
+        assert self.get_user_detail(access_token).status_code == 200
+
+        data_base = session_local()
+        user = data_base.query(User).filter_by(name=name).first()
+        user_id, token_epoch = user.id, user.token_epoch
+        data_base.close()
+
+        # 캐시가 DB보다 큰 값을 갖고 있어도(DB 복원 등) DB를 다시 읽어 토큰을 받아들인다.
+        user_token_epoch_cache.set(
+            user_id, token_epoch + 5, user_token_epoch_cache.get_generation()
+        )
+        assert self.get_user_detail(access_token).status_code == 200
+        assert user_token_epoch_cache.get(user_id) == token_epoch
+
+        # 다른 process에서 epoch을 올리면 공유 캐시를 통해 이 process에서도 토큰이 거부된다.
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                database.recreate_database_engines_after_fork()
+                child_data_base = session_local()
+                bump_user_token_epoch(
+                    data_base=child_data_base,
+                    user=child_data_base.get(User, user_id),
+                )
+                child_data_base.commit()
+                child_data_base.close()
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+        assert self.get_user_detail(access_token).status_code == 401
+
+    def delete_expired_jwt_tokens_test(self, name, password1):
+        # 재로그인으로 이전 access token을 blacklist에 추가한 뒤 만료 처리
+        assert self.login_user(name, password1).status_code == 200
+        assert self.login_user(name, password1).status_code == 200
+
+        data_base = session_local()
+
+        user_id = data_base.query(User).filter_by(name=name).first().id
+        data_base.query(JWTAccessTokenBlackList).filter_by(user_id=user_id).update(
+            {JWTAccessTokenBlackList.expired_date: datetime.now() - timedelta(days=1)}
+        )
+        data_base.commit()
+
+        report = delete_expired_jwt_tokens(None)
+
+        assert report["jwt_access_token_blacklist"]["deleted"] > 0
+        assert (
+            data_base.query(JWTAccessTokenBlackList)
+            .filter(JWTAccessTokenBlackList.expired_date <= datetime.now())
+            .count()
+            == 0
+        )
+
+        data_base.close()
+
+    def ban_access_token_rollback_test(self, name, password1):
+        response_login = self.login_user(name, password1)
+        assert response_login.status_code == 200
+        access_token = response_login.json().get("access_token")
+        token_id = get_unverified_token_claims(access_token).get("uuid")
+
+        data_base = session_local()
+        user_id = data_base.query(User).filter_by(name=name).first().id
+
+        # rollback된 폐기는 캐시에도 남지 않는다.
+        ban_access_token(
+            data_base=data_base, user_id=user_id, user_access_token=access_token
+        )
+        data_base.rollback()
+        assert not access_token_revocation_cache.contains(token_id)
+        assert self.get_user_detail(access_token).status_code == 200
+
+        ban_access_token(
+            data_base=data_base, user_id=user_id, user_access_token=access_token
+        )
+        data_base.commit()
+        assert access_token_revocation_cache.contains(token_id)
+        assert self.get_user_detail(access_token).status_code == 401
+
+        data_base.close()
+
+    def logout_user(self, access_token: str):
+        response_test = client.post(
+            URL_USER_LOGOUT_USER,
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        return response_test
+
+    def delete_expired_refresh_token_logout_test(self, name, password1):
+        response_login = self.login_user(name, password1)
+        assert response_login.status_code == 200
+        access_token = response_login.json().get("access_token")
+
+        data_base = session_local()
+
+        user_id = data_base.query(User).filter_by(name=name).first().id
+        access_token_expire = timedelta(minutes=get_settings().APP_JWT_EXPIRE_MINUTES)
+
+        # refresh token만 만료되고 마지막 access token이 남아있는 동안에는 지우지 않는다.
+        data_base.query(JWTRefreshTokenList).filter_by(user_id=user_id).update(
+            {JWTRefreshTokenList.expired_date: datetime.now() - timedelta(minutes=1)}
+        )
+        data_base.commit()
+        delete_expired_jwt_tokens(None)
+        assert data_base.get(JWTRefreshTokenList, user_id) is not None
+
+        data_base.query(JWTRefreshTokenList).filter_by(user_id=user_id).update(
+            {
+                JWTRefreshTokenList.expired_date: datetime.now()
+                - access_token_expire
+                - timedelta(minutes=1)
+            }
+        )
+        data_base.commit()
+        delete_expired_jwt_tokens(None)
+        data_base.expire_all()
+        assert data_base.get(JWTRefreshTokenList, user_id) is None
+
+        data_base.close()
+
+        # refresh token row가 정리된 뒤에도 logout은 성공해야 한다.
+        response_test = self.logout_user(access_token)
+        assert response_test.status_code == 200
+        assert response_test.json() == {"result": "success"}
+
 
 user_test_methods = UserTestMethods()
 
@@ -289,6 +481,16 @@ class TestUser:
 
         user_test_methods.login_user_test(user_id, name, response_test)
 
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_user.json")
+    )
+    def test_relogin_user(self, pn, name, password1):
+        response_login = user_test_methods.login_user(name, password1)
+        access_token_old = response_login.json().get("access_token")
+
+        response_test = user_test_methods.login_user(name, password1)
+        user_test_methods.relogin_user_test(access_token_old, response_test)
+
     @pytest.mark.parametrize(
         **parameter_data_loader("domain/user/test_get_user_detail.json")
     )
@@ -300,6 +502,51 @@ class TestUser:
         response_test = user_test_methods.get_user_detail(access_token)
         user_test_methods.get_user_detail_test(user_columns, response_test)
 
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_user.json")
+    )
+    def test_jwt_decode_cache(self, pn, name, password1):
+        response_login = user_test_methods.login_user(name, password1)
+        access_token = response_login.json().get("access_token")
+
+        user_test_methods.jwt_decode_cache_test(access_token)
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_rate_limit.json")
+    )
+    def test_login_rate_limit(self, pn, name, password1, password_wrong):
+        user_test_methods.login_rate_limit_test(name, password1, password_wrong)
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_rate_limit.json")
+    )
+    def test_login_rate_limit_refund(self, pn, name, password1, password_wrong):
+        user_test_methods.login_rate_limit_refund_test(name, password1, password_wrong)
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_user.json")
+    )
+    def test_token_epoch_shared_cache(self, pn, name, password1):
+        user_test_methods.token_epoch_shared_cache_test(name, password1)
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_user.json")
+    )
+    def test_delete_expired_jwt_tokens(self, pn, name, password1):
+        user_test_methods.delete_expired_jwt_tokens_test(name, password1)
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_user.json")
+    )
+    def test_ban_access_token_rollback(self, pn, name, password1):
+        user_test_methods.ban_access_token_rollback_test(name, password1)
+
+    @pytest.mark.parametrize(
+        **parameter_data_loader("domain/user/test_login_user.json")
+    )
+    def test_delete_expired_refresh_token_logout(self, pn, name, password1):
+        user_test_methods.delete_expired_refresh_token_logout_test(name, password1)
+
     @pytest.mark.parametrize(
         **parameter_data_loader("domain/user/test_update_user_detail.json")
     )
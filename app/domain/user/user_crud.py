@@ -1,10 +1,11 @@
 import secrets
 
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from models import User
-from auth import get_password_context, current_user_payload
-from database import data_base_dependency
+from auth import hash_password_async, current_user_payload, get_user_board_scopes
+from database import data_base_dependency, run_and_commit
 from http_execption_params import http_exception_params
 
 
@@ -42,10 +43,9 @@ def get_user_with_id_and_name(
     return data_base.query(User).filter_by(id=id, name=name).first()
 
 
-def create_user(
+def validate_user_not_existed(
     data_base: data_base_dependency,
     name: str,
-    password: str,
     email: str,
 ):
     if get_user_with_username(data_base=data_base, name=name):
@@ -53,24 +53,72 @@ def create_user(
     if get_user_with_email(data_base=data_base, eamil=email):
         raise HTTPException(**http_exception_params["already_user_email_existed"])
 
-    generated_password_salt = secrets.token_hex(4)
+
+def add_user(
+    data_base: data_base_dependency,
+    name: str,
+    password: str,
+    password_salt: str,
+    email: str,
+):
     user = User(
         name=name,
-        password=get_password_context().hash(password + generated_password_salt),
-        password_salt=generated_password_salt,
+        password=password,
+        password_salt=password_salt,
         email=email,
     )
     data_base.add(user)
-    data_base.commit()
+    data_base.flush()
 
     return user.id
 
+
+async def create_user(
+    data_base: data_base_dependency,
+    name: str,
+    password: str,
+    email: str,
+):
+    await run_in_threadpool(validate_user_not_existed, data_base, name, email)
+
+    generated_password_salt = secrets.token_hex(4)
+    hashed_password = await hash_password_async(password, generated_password_salt)
+
+    # id를 받기 위한 flush와 commit을 한 번에 실행해 write lock을 await 사이에 잡고 있지 않는다.
+    return await run_in_threadpool(
+        run_and_commit,
+        add_user,
+        data_base,
+        name,
+        hashed_password,
+        generated_password_salt,
+        email,
+    )
+
+
 def get_user_detail(
     data_base: data_base_dependency,
     id: int,
     name: str,
 ):
-    return data_base.query(User).filter_by(id=id, name=name).first()
+    user = data_base.query(User).filter_by(id=id, name=name).first()
+
+    if not user:
+        return user
+
+    # user.boards에는 규칙으로 부여된 board가 포함되지 않는다.
+    return {
+        "name": user.name,
+        "email": user.email,
+        "join_date": user.join_date,
+        "boards": [
+            {"id": board_id}
+            for board_id in sorted(
+                get_user_board_scopes(data_base=data_base, user_id=user.id)
+            )
+        ],
+        "posts": user.posts,
+    }
 
 
 def update_user(
@@ -92,13 +140,11 @@ def update_user(
     user.email = email
 
     data_base.add(user)
-    data_base.commit()
 
 
-def update_user_password(
+def get_token_user(
     data_base: data_base_dependency,
     token: current_user_payload,
-    password: str,
 ):
     user = (
         data_base.query(User)
@@ -109,12 +155,34 @@ def update_user_password(
     if not user:
         raise HTTPException(**http_exception_params["user_not_existed"])
 
-    generated_password_salt = secrets.token_hex(4)
-    user.password = get_password_context().hash(password + generated_password_salt)
-    user.password_salt = generated_password_salt
+    return user
+
+
+def save_user_password(
+    data_base: data_base_dependency,
+    user: User,
+    password: str,
+    password_salt: str,
+):
+    user.password = password
+    user.password_salt = password_salt
 
     data_base.add(user)
-    data_base.commit()
+
+
+async def update_user_password(
+    data_base: data_base_dependency,
+    token: current_user_payload,
+    password: str,
+):
+    user = await run_in_threadpool(get_token_user, data_base, token)
+
+    generated_password_salt = secrets.token_hex(4)
+    hashed_password = await hash_password_async(password, generated_password_salt)
+
+    await run_in_threadpool(
+        save_user_password, data_base, user, hashed_password, generated_password_salt
+    )
 
 
 def delete_user(
@@ -128,4 +196,3 @@ def delete_user(
     )
 
     data_base.delete(user)
-    data_base.commit()
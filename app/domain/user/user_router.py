@@ -1,10 +1,10 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette import status
 
-from database import data_base_dependency
+from database import data_base_dependency, UnitOfWorkRoute
 from domain.user import user_schema, user_crud
 from auth import (
     current_user_payload,
@@ -15,15 +15,17 @@ from auth import (
 )
 import v1_url
 
-router = APIRouter(prefix=v1_url.USER_PREFIX, tags=["user"])
+router = APIRouter(
+    prefix=v1_url.USER_PREFIX, tags=["user"], route_class=UnitOfWorkRoute
+)
 
 
 @router.post(v1_url.USER_CREATE_USER, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     data_base: data_base_dependency,
     schema: user_schema.RequestUserCreate,
 ):
-    user_id = user_crud.create_user(
+    user_id = await user_crud.create_user(
         data_base=data_base,
         name=schema.name,
         password=schema.password1,
@@ -34,12 +36,17 @@ def create_user(
 
 
 @router.post(v1_url.USER_LOGIN_USER, response_model=user_schema.ResponseUserToken)
-def login_user(
+async def login_user(
+    request: Request,
     response: Response,
     data_base: data_base_dependency,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ):
-    tokens = generate_user_tokens(form_data=form_data, data_base=data_base)
+    tokens = await generate_user_tokens(
+        form_data=form_data,
+        data_base=data_base,
+        client_host=request.client.host if request.client else None,
+    )
 
     response.set_cookie(
         key="refresh_token",
@@ -99,12 +106,12 @@ def update_user_detail(
 
 
 @router.put(v1_url.USER_UPDATE_USER_PASSWORD, status_code=status.HTTP_204_NO_CONTENT)
-def update_user_password(
+async def update_user_password(
     token: current_user_payload,
     data_base: data_base_dependency,
     schema: user_schema.RequestUserUpdatePassword,
 ):
-    user_crud.update_user_password(
+    await user_crud.update_user_password(
         data_base=data_base,
         token=token,
         password=schema.password1,
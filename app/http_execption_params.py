@@ -29,6 +29,20 @@ http_exception_params = {
         "status_code": status.HTTP_404_NOT_FOUND,
         "detail": "AI 로그가 존재하지 않습니다.",
     },
+    "invalid_cursor": {
+        "status_code": status.HTTP_400_BAD_REQUEST,
+        "detail": "잘못된 cursor입니다.",
+    },
+    "password_hash_busy": {
+        "status_code": status.HTTP_503_SERVICE_UNAVAILABLE,
+        "detail": "요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요.",
+        "headers": {"Retry-After": "1"},
+    },
+    "too_many_login_attempts": {
+        "status_code": status.HTTP_429_TOO_MANY_REQUESTS,
+        "detail": "로그인 시도가 너무 많습니다. 잠시 후 다시 시도해 주세요.",
+        "headers": {"Retry-After": "60"},
+    },
     
     "not_user": {
         "status_code": status.HTTP_401_UNAUTHORIZED,
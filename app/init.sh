@@ -5,10 +5,10 @@ ALEMBIC_TEMPLATE_FOLDER=./alembic_template_sqlite
 ALEMBIC_TEMPLATE_FOLDER_ABSOLUTE_PATH=$(realpath "$ALEMBIC_TEMPLATE_FOLDER")
 
 if [ -e $DB_FILE ]; then
-	uvicorn main:app --host 0.0.0.0 --port 8000 --proxy-headers
+	uvicorn main:create_app --factory --host 0.0.0.0 --port 8000 --proxy-headers --forwarded-allow-ips "${FORWARDED_ALLOW_IPS:-127.0.0.1}"
 else
     alembic init -t "$ALEMBIC_TEMPLATE_FOLDER_ABSOLUTE_PATH" migrations
     alembic revision --autogenerate
     alembic upgrade head
-    uvicorn main:app --host 0.0.0.0 --port 8000 --proxy-headers
+    uvicorn main:create_app --factory --host 0.0.0.0 --port 8000 --proxy-headers --forwarded-allow-ips "${FORWARDED_ALLOW_IPS:-127.0.0.1}"
 fi
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import sys
 import contextlib
 
@@ -9,53 +10,79 @@ import uvicorn
 
 import v1_router
 from domain.admin import admin_crud
-from database import database_engine_shutdown
+from domain.board import board_crud
+from database import (
+    create_database_engines,
+    database_engine_shutdown,
+    async_database_engine_shutdown,
+    QueryStatsMiddleware,
+    run_with_write_session_async,
+)
+from auth import password_hash_executor
 
 
 @contextlib.asynccontextmanager
 async def app_lifespan(app: FastAPI):
     print("lifespan_start")
+    post_view_flush_task = asyncio.create_task(
+        board_crud.flush_post_view_counts_periodically()
+    )
     yield
     print("lifespan_shutdown")
+    post_view_flush_task.cancel()
+    # 종료 전에 남은 조회수를 반영한다.
+    await run_with_write_session_async(board_crud.flush_post_view_counts)
+    password_hash_executor.shutdown()
     database_engine_shutdown()
+    await async_database_engine_shutdown()
 
 
-app = FastAPI(
-    lifespan=app_lifespan,
-    servers=[
-        # {"url": "/test", "description": "Test environment"},
-        # {"url": "/", "description": "Production environment"},
-    ],
-)
+def index_page(request: Request):
+    print(request.cookies)
+    return {"message": "Hello, FastAPI!"}
 
-app.mount("/static", StaticFiles(directory="staticfile"), name="static")
 
-# origins = ["http://localhost:3000", "http://127.0.0.1:3000"] # 프론트엔드가 사용하는 주소 추가
-origins = ["*"]
+def create_app() -> FastAPI:
+    # engine은 app을 만드는 process에서 만든다. (uvicorn --factory로 실행하므로 import만으로는 만들지 않는다.)
+    create_database_engines()
 
+    app = FastAPI(
+        lifespan=app_lifespan,
+        servers=[
+            # {"url": "/test", "description": "Test environment"},
+            # {"url": "/", "description": "Production environment"},
+        ],
+    )
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    app.mount("/static", StaticFiles(directory="staticfile"), name="static")
 
-app.include_router(v1_router.router)
+    # origins = ["http://localhost:3000", "http://127.0.0.1:3000"] # 프론트엔드가 사용하는 주소 추가
+    origins = ["*"]
 
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
-@app.get("/", tags=["main"])
-def index_page(request: Request):
-    print(request.cookies)
-    return {"message": "Hello, FastAPI!"}
+    app.add_middleware(QueryStatsMiddleware)
+
+    app.include_router(v1_router.router)
+    app.add_api_route("/", index_page, methods=["GET"], tags=["main"])
+
+    return app
 
 
 if __name__ == "__main__":
     argv = sys.argv[1:]
 
     if len(argv) == 0:
-        uvicorn.run("main:app", reload=True, log_level="debug")
+        uvicorn.run("main:create_app", factory=True, reload=True, log_level="debug")
     else:
+        create_database_engines()
         if "createsuperuser" in argv:
             admin_crud.create_admin_with_terminal(data_base=None)
+        if "recountcounters" in argv:
+            admin_crud.recount_aggregate_counters_with_terminal(data_base=None)
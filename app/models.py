@@ -11,35 +11,44 @@ from sqlalchemy import (
     Table,
     Column,
     BigInteger,
+    Index,
+    event,
+    func,
+    select,
+    update,
+    bindparam,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, object_session
 
 from database import Base
 
 
+# table info의 bind_key가 SQLALCHEMY_DATABASE_BINDS에 있으면 그 database 파일을 사용한다.
 class PostViewIncrement(Base):
     __tablename__ = "post_view_increment"
-    __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = {"sqlite_autoincrement": True, "info": {"bind_key": "analytics"}}
     id: Mapped[int] = mapped_column(primary_key=True)
-    post_id: Mapped[int] = mapped_column(ForeignKey("post.id"))
+    post_id: Mapped[int] = mapped_column(ForeignKey("post.id"), index=True)
     timestamp: Mapped[DateTime] = mapped_column(DateTime(), default=datetime.now)
 
 
 class JWTAccessTokenBlackList(Base):
     __tablename__ = "jwt_access_token_blacklist"
     # __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = {"info": {"bind_key": "auth"}}
 
     user_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
     access_token: Mapped[str] = mapped_column(String(), primary_key=True)
     create_date: Mapped[DateTime] = mapped_column(
         DateTime(), default=datetime.now, onupdate=datetime.now
     )
-    expired_date: Mapped[DateTime] = mapped_column(DateTime())
+    expired_date: Mapped[DateTime] = mapped_column(DateTime(), index=True)
 
 
 class JWTRefreshTokenList(Base):
     __tablename__ = "jwt_refresh_token_list"
     # __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = {"info": {"bind_key": "auth"}}
 
     user_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
     refresh_token: Mapped[str] = mapped_column(String())
@@ -47,12 +56,13 @@ class JWTRefreshTokenList(Base):
     create_date: Mapped[DateTime] = mapped_column(
         DateTime(), default=datetime.now, onupdate=datetime.now
     )
-    expired_date: Mapped[DateTime] = mapped_column(DateTime())
+    expired_date: Mapped[DateTime] = mapped_column(DateTime(), index=True)
 
 
 class PostFile(Base):
     __tablename__ = "post_file"
     # __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = {"info": {"bind_key": "content"}}
 
     post: Mapped["Post"] = relationship(back_populates="attached_files")
     post_id: Mapped[int] = mapped_column(ForeignKey("post.id"), primary_key=True)
@@ -66,6 +76,7 @@ class PostFile(Base):
 class CommentFile(Base):
     __tablename__ = "comment_file"
     # __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = {"info": {"bind_key": "content"}}
 
     comment: Mapped["Comment"] = relationship(back_populates="attached_files")
     comment_id: Mapped[int] = mapped_column(ForeignKey("comment.id"), primary_key=True)
@@ -96,6 +107,15 @@ class UserPermissionTable(Base):
     create_date: Mapped[DateTime] = mapped_column(DateTime(), default=datetime.now)
 
 
+class UserPermissionDenyTable(Base):
+    # 규칙으로 부여된 board 권한에서 제외된 user
+    __tablename__ = "user_board_deny_table"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True)
+    board_id: Mapped[int] = mapped_column(ForeignKey("board.id"), primary_key=True)
+    create_date: Mapped[DateTime] = mapped_column(DateTime(), default=datetime.now)
+
+
 class User(Base):
     __tablename__ = "user"
     __table_args__ = {"sqlite_autoincrement": True}
@@ -129,6 +149,7 @@ class User(Base):
     is_superuser: Mapped[Boolean] = mapped_column(Boolean(), default=False)
     is_banned: Mapped[Boolean] = mapped_column(Boolean(), default=False)
     is_active: Mapped[Boolean] = mapped_column(Boolean(), default=True)
+    token_epoch: Mapped[int] = mapped_column(Integer(), default=0, server_default="0")
 
 
 class Board(Base):
@@ -142,6 +163,9 @@ class Board(Base):
         secondary="user_board_table",
         back_populates="boards",
     )  # N to M
+    users_denied: Mapped[List["User"]] = relationship(
+        secondary="user_board_deny_table",
+    )  # N to M
     posts: Mapped[List["Post"]] = relationship(
         back_populates="board", cascade="all, delete"
     )  # 1 to N
@@ -149,11 +173,20 @@ class Board(Base):
     is_visible: Mapped[Boolean] = mapped_column(Boolean(), default=False)
     is_available: Mapped[Boolean] = mapped_column(Boolean(), default=False)
     permission_verified_user_id_range: Mapped[int] = mapped_column(default=0)
+    # True이면 id가 permission_verified_user_id_range 이하인 user에게 권한을 부여한다.
+    is_permission_implicit: Mapped[Boolean] = mapped_column(
+        Boolean(), default=False, server_default="0"
+    )
+    number_of_post: Mapped[int] = mapped_column(Integer(), default=0, server_default="0")
 
 
 class Post(Base):
     __tablename__ = "post"
-    __table_args__ = {"sqlite_autoincrement": True}
+    # 목록 조회의 filter 칼럼 + 정렬 칼럼 순서로 index를 만든다. (역순 정렬도 같은 index를 사용)
+    __table_args__ = (
+        Index("ix_post_board_id_create_date_id", "board_id", "create_date", "id"),
+        {"sqlite_autoincrement": True, "info": {"bind_key": "content"}},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -180,7 +213,10 @@ class Post(Base):
 
 class Comment(Base):
     __tablename__ = "comment"
-    __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = (
+        Index("ix_comment_post_id_create_date_id", "post_id", "create_date", "id"),
+        {"sqlite_autoincrement": True, "info": {"bind_key": "content"}},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -202,7 +238,15 @@ class Comment(Base):
 
 class ChatSession(Base):
     __tablename__ = "chat_session"
-    __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = (
+        Index(
+            "ix_chat_session_user_create_id_create_date_id",
+            "user_create_id",
+            "create_date",
+            "id",
+        ),
+        {"sqlite_autoincrement": True, "info": {"bind_key": "chat"}},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_create_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -222,11 +266,20 @@ class ChatSession(Base):
     )
     is_visible: Mapped[Boolean] = mapped_column(Boolean(), default=True)
     is_closed: Mapped[Boolean] = mapped_column(Boolean(), default=False)
+    number_of_chat: Mapped[int] = mapped_column(Integer(), default=0, server_default="0")
 
 
 class Chat(Base):
     __tablename__ = "chat"
-    __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = (
+        Index(
+            "ix_chat_chat_session_id_create_date_id",
+            "chat_session_id",
+            "create_date",
+            "id",
+        ),
+        {"sqlite_autoincrement": True, "info": {"bind_key": "chat"}},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -261,11 +314,19 @@ class AI(Base):
     is_visible: Mapped[Boolean] = mapped_column(Boolean(), default=False)
     is_available: Mapped[Boolean] = mapped_column(Boolean(), default=False)
     celery_task_id: Mapped[str] = mapped_column(String(64))
+    number_of_ailog: Mapped[int] = mapped_column(
+        Integer(), default=0, server_default="0"
+    )
 
 
 class AIlog(Base):
     __tablename__ = "ai_log"
-    __table_args__ = {"sqlite_autoincrement": True}
+    # user_id, ai_id 중 하나 또는 둘 다로 filter하고 id로 정렬한다.
+    __table_args__ = (
+        Index("ix_ai_log_user_id_id", "user_id", "id"),
+        Index("ix_ai_log_ai_id_id", "ai_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -282,3 +343,74 @@ class AIlog(Base):
     finish_date: Mapped[Optional[DateTime]] = mapped_column(DateTime(), default=None)
     is_finished: Mapped[Boolean] = mapped_column(Boolean(), default=False)
     celery_task_id: Mapped[str] = mapped_column(String(64))
+
+
+# 목록의 total을 COUNT(*) 대신 읽을 수 있도록 부모의 개수 칼럼을 같은 transaction에서 갱신한다.
+# (자식 class, 자식의 부모 id 칼럼, 부모 class, 부모의 개수 칼럼)
+aggregate_counters = [
+    (Post, Post.board_id, Board, Board.number_of_post),
+    (Comment, Comment.post_id, Post, Post.number_of_comment),
+    (Chat, Chat.chat_session_id, ChatSession, ChatSession.number_of_chat),
+    (AIlog, AIlog.ai_id, AI, AI.number_of_ailog),
+]
+
+
+def keep_update_date(parent, values: dict) -> dict:
+    # 개수만 바뀐 것이므로 onupdate로 부모의 update_date가 바뀌어 수정된 것처럼 보이지 않게 한다.
+    if "update_date" in parent.__table__.c:
+        values["update_date"] = parent.__table__.c.update_date
+
+    return values
+
+
+def count_on_insert_and_delete(child, parent_id_column, parent, counter_column):
+    def update_counter(connection, target, amount: int):
+        # 부모가 다른 database 파일에 있으면 같은 session에서 부모 쪽 연결을 사용한다.
+        connection = object_session(target).connection(
+            bind_arguments={"mapper": parent}
+        )
+        connection.execute(
+            update(parent)
+            .where(parent.id == getattr(target, parent_id_column.key))
+            .values(keep_update_date(parent, {counter_column: counter_column + amount}))
+        )
+
+    # cascade로 삭제되는 자식도 ORM flush를 거치므로 함께 반영된다.
+    @event.listens_for(child, "after_insert")
+    def increase_counter(mapper, connection, target):
+        update_counter(connection, target, 1)
+
+    @event.listens_for(child, "after_delete")
+    def decrease_counter(mapper, connection, target):
+        update_counter(connection, target, -1)
+
+
+for aggregate_counter in aggregate_counters:
+    count_on_insert_and_delete(*aggregate_counter)
+
+
+def recount_aggregate_counters(data_base):
+    # 칼럼을 추가한 뒤나 ORM을 거치지 않고 삭제한 뒤 개수를 다시 맞춘다.
+    # 부모와 자식이 다른 database 파일에 있을 수 있으므로 subquery 대신 개수를 읽어서 갱신한다.
+    for child, parent_id_column, parent, counter_column in aggregate_counters:
+        counts = data_base.execute(
+            select(parent_id_column, func.count()).group_by(parent_id_column)
+        ).all()
+
+        data_base.execute(
+            update(parent).values(keep_update_date(parent, {counter_column: 0}))
+        )
+        if counts:
+            # 자식만 남은 부모 id가 있어도 실패하지 않도록 ORM bulk update 대신 table에 실행한다.
+            parent_table = parent.__table__
+            data_base.execute(
+                update(parent_table)
+                .where(parent_table.c.id == bindparam("parent_id"))
+                .values(
+                    keep_update_date(parent, {counter_column.key: bindparam("count")})
+                ),
+                [
+                    {"parent_id": parent_id, "count": count}
+                    for parent_id, count in counts
+                ],
+            )
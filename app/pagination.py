@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import func, inspect, tuple_
+
+from config import get_settings
+
+from http_execption_params import http_exception_params
+
+
+# cursor는 마지막으로 받은 row의 정렬 칼럼 값을 담는다. 예) (create_date, id)
+def encode_cursor(row, order_columns: list) -> str:
+    values = []
+    for column in order_columns:
+        value = getattr(row, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor_value(column, value):
+    # 칼럼의 python type과 다른 값(list, dict, bool 등)은 database까지 보내지 않는다.
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+
+    if isinstance(value, bool) or not isinstance(value, python_type):
+        raise TypeError(value)
+
+    return value
+
+
+def decode_cursor(cursor: str, order_columns: list) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+        if (not isinstance(values, list)) or (len(values) != len(order_columns)):
+            raise ValueError(cursor)
+
+        return [
+            decode_cursor_value(column, value)
+            for column, value in zip(order_columns, values)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(**http_exception_params["invalid_cursor"])
+
+
+def paginate(
+    statement,
+    order_columns: list,
+    skip: int,
+    limit: int,
+    cursor: str | None,
+    is_descending: bool = False,
+):
+    # cursor가 있으면 skip 대신 정렬 index에서 바로 다음 위치를 찾는다. (깊은 페이지도 비용이 같다.)
+    if cursor:
+        values = decode_cursor(cursor, order_columns)
+        columns = tuple_(*order_columns) if len(order_columns) > 1 else order_columns[0]
+        values = tuple_(*values) if len(order_columns) > 1 else values[0]
+        statement = statement.where(columns < values if is_descending else columns > values)
+        skip = 0
+
+    # 다음 페이지가 있는지 알기 위해 한 개 더 가져온다.
+    return statement.offset(skip).limit(limit + 1)
+
+
+def get_page(rows: list, order_columns: list, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    if not rows:
+        return rows, None
+
+    return rows, encode_cursor(rows[-1], order_columns)
+
+
+def get_summary_columns(model, content_column):
+    # 목록에서는 긴 본문 대신 앞부분만 읽는다. ORM 객체를 만들지 않으므로 identity map에도 쌓이지 않는다.
+    preview_length = get_settings().APP_CONTENT_PREVIEW_LENGTH
+    return [
+        func.substr(content_column, 1, preview_length).label(attribute.key)
+        if attribute.key == content_column.key
+        else getattr(model, attribute.key)
+        for attribute in inspect(model).column_attrs
+    ]
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from http_execption_params import http_exception_params
+
+
+class PasswordHashExecutor:
+    def __init__(self, max_workers: int, max_queue_size: int):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.executor: ThreadPoolExecutor | None = None
+        # 실행중인 작업과 대기중인 작업의 수
+        self.queue_depth = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        # fork 이후에도 안전하도록 처음 사용할 때 생성한다.
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="password_hash",
+                )
+            return self.executor
+
+    async def run(self, function, *args):
+        with self.lock:
+            if self.queue_depth >= self.max_workers + self.max_queue_size:
+                self.rejected += 1
+                raise HTTPException(**http_exception_params["password_hash_busy"])
+            self.queue_depth += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.get_executor(), function, *args
+            )
+        finally:
+            with self.lock:
+                self.queue_depth -= 1
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self.queue_depth,
+            "waiting": max(0, self.queue_depth - self.max_workers),
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
@@ -0,0 +1,152 @@
+import hashlib
+from collections import OrderedDict
+import threading
+import time
+
+from auth_cache import SharedMemoryFile
+
+
+# (bucket key, 최대 token 수, 초당 충전되는 token 수)
+BucketRule = tuple[str, float, float]
+
+
+def get_refilled_tokens(
+    tokens: float,
+    update_timestamp: float,
+    now: float,
+    capacity: float,
+    refill_per_second: float,
+) -> float:
+    return min(capacity, tokens + max(0.0, now - update_timestamp) * refill_per_second)
+
+
+class TokenBucketLimiter:
+    def __init__(self, max_size: int):
+        # bucket key -> (남은 token 수, 마지막 갱신 시각)
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+    def get_tokens(self, rule: BucketRule, now: float) -> float:
+        key, capacity, refill_per_second = rule
+        value = self.buckets.get(key)
+
+        if value is None:
+            return capacity
+
+        return get_refilled_tokens(*value, now, capacity, refill_per_second)
+
+    def set_tokens(self, key: str, tokens: float, now: float):
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+
+        # 가장 오래 사용되지 않은 bucket은 대부분 가득 찬 상태이므로 버려도 된다.
+        while len(self.buckets) > self.max_size:
+            self.buckets.popitem(last=False)
+
+    def acquire(self, rules: list[BucketRule]) -> bool:
+        now = time.time()
+
+        with self.lock:
+            tokens_list = [self.get_tokens(rule, now) for rule in rules]
+
+            if any(tokens < 1 for tokens in tokens_list):
+                return False
+
+            for rule, tokens in zip(rules, tokens_list):
+                self.set_tokens(rule[0], tokens - 1, now)
+
+            return True
+
+    def release(self, rules: list[BucketRule]):
+        now = time.time()
+
+        with self.lock:
+            for rule in rules:
+                self.set_tokens(rule[0], min(rule[1], self.get_tokens(rule, now) + 1), now)
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+    def __len__(self):
+        return len(self.buckets)
+
+
+class SharedTokenBucketLimiter(SharedMemoryFile):
+    # slot : bucket key의 64bit hash, 남은 token 수, 마지막 갱신 시각
+    magic = b"LOGINRL1"
+    slot_format = "<Qdd"
+    # 이 범위 안에 빈 slot이 없으면 가장 오래된 bucket을 덮어쓴다.
+    probe_limit = 8
+
+    @staticmethod
+    def get_key(key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def find_slot(self, key: int):
+        # lock 안에서 호출한다. (slot index, 기존 bucket 여부)를 반환한다.
+        evict_index = None
+        evict_update_timestamp = None
+
+        for probe in range(min(self.probe_limit, self.slot_count)):
+            index = (key + probe) % self.slot_count
+            slot_key, _, slot_update_timestamp = self.get_slot(index)
+
+            if slot_key == key:
+                return index, True
+            if slot_key == 0:
+                return index, False
+            if (evict_index is None) or (slot_update_timestamp < evict_update_timestamp):
+                evict_index = index
+                evict_update_timestamp = slot_update_timestamp
+
+        return evict_index, False
+
+    def get_tokens(self, rule: BucketRule, now: float):
+        key, capacity, refill_per_second = rule
+        index, is_existed = self.find_slot(self.get_key(key))
+
+        if not is_existed:
+            return index, capacity
+
+        _, tokens, update_timestamp = self.get_slot(index)
+        return index, get_refilled_tokens(
+            tokens, update_timestamp, now, capacity, refill_per_second
+        )
+
+    def acquire(self, rules: list[BucketRule]) -> bool:
+        now = time.time()
+
+        with self.lock:
+            tokens_list = [self.get_tokens(rule, now)[1] for rule in rules]
+
+            if any(tokens < 1 for tokens in tokens_list):
+                return False
+
+            # 앞선 bucket을 저장하면서 slot이 바뀔 수 있으므로 저장 직전에 다시 찾는다.
+            for rule, tokens in zip(rules, tokens_list):
+                index, _ = self.get_tokens(rule, now)
+                self.set_slot(index, self.get_key(rule[0]), tokens - 1, now)
+
+            return True
+
+    def release(self, rules: list[BucketRule]):
+        now = time.time()
+
+        with self.lock:
+            for rule in rules:
+                index, tokens = self.get_tokens(rule, now)
+                self.set_slot(
+                    index, self.get_key(rule[0]), min(rule[1], tokens + 1), now
+                )
+
+    def clear(self):
+        with self.lock:
+            self.clear_slots()
+
+    def __len__(self):
+        return sum(
+            1 for index in range(self.slot_count) if self.get_slot(index)[0] != 0
+        )
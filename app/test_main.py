@@ -1,14 +1,30 @@
+import os
+import re
+import tempfile
+
 from pytest import MonkeyPatch
 
 from fastapi.testclient import TestClient
+from httpx import Response
 
-from sqlalchemy import delete, text
+from sqlalchemy import delete, inspect, text
 
-from main import app
+from main import create_app
 import models
-from database import session_local
+import database
+from database import session_local, Base
+from config import get_settings
+from auth import (
+    access_token_revocation_cache,
+    user_token_epoch_cache,
+    jwt_decode_cache,
+    user_board_scope_cache,
+    login_rate_limiter,
+)
 
 
+# 테스트 module은 이 app을 함께 사용한다. (database engine도 한 번만 만든다.)
+app = create_app()
 client = TestClient(app)
 
 
@@ -21,6 +37,8 @@ class MainTestMethods:
         data_base.execute(delete(models.CommentFile))
         data_base.execute(delete(models.UserChatSessionTable))
         data_base.execute(delete(models.UserPermissionTable))
+        data_base.execute(delete(models.UserPermissionDenyTable))
+        data_base.execute(delete(models.PostViewIncrement))
         data_base.execute(delete(models.AIlog))
         data_base.execute(delete(models.AI))
         data_base.execute(delete(models.Chat))
@@ -30,14 +48,21 @@ class MainTestMethods:
         data_base.execute(delete(models.Board))
         data_base.execute(delete(models.User))
 
-        for value in data_base.execute(text("SELECT * FROM sqlite_sequence")).all():
-            data_base.execute(
-                text(f'UPDATE sqlite_sequence SET seq = 0 WHERE name = "{value[0]}"')
-            )
-
         data_base.commit()
         data_base.close()
 
+        # database 파일을 나눠 쓰는 경우 파일마다 sqlite_sequence가 있다. (AUTOINCREMENT table이 없으면 없다.)
+        for bind_engine, _, _ in database.database_engines.values():
+            with bind_engine.begin() as connection:
+                if inspect(connection).has_table("sqlite_sequence"):
+                    connection.execute(text("UPDATE sqlite_sequence SET seq = 0"))
+
+        access_token_revocation_cache.clear()
+        user_token_epoch_cache.clear()
+        jwt_decode_cache.clear()
+        user_board_scope_cache.clear()
+        login_rate_limiter.clear()
+
     def patch(self):
         def patch_task():
             a = input()
@@ -59,6 +84,154 @@ class MainTestMethods:
         celery_worker.reload()
         assert mul.delay(2, 2).get() == 4
 
+    def check_query_budget(self, response_test: Response, query_budget: int):
+        # 관계를 lazy load하는 N+1 query가 생기면 요청 하나의 SQL 수가 budget을 넘는다.
+        server_timing = response_test.headers.get("server-timing", "")
+        queries = re.search(r'desc="(\d+) queries"', server_timing)
+
+        assert queries != None
+        assert int(queries.group(1)) <= query_budget, server_timing
+
+    def recreate_database_engines_after_fork(self):
+        # 부모가 연결을 사용한 뒤 fork해도 자식은 자기 engine으로 query를 실행할 수 있어야 한다.
+        parent_engine = database.engine
+        data_base = session_local()
+        data_base.execute(text("SELECT 1"))
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                database.recreate_database_engines_after_fork()
+                child_data_base = session_local()
+                if (
+                    database.engine is not parent_engine
+                    and child_data_base.get_bind() is database.engine
+                    and child_data_base.execute(text("SELECT 1")).scalar() == 1
+                ):
+                    exit_code = 0
+                child_data_base.close()
+            finally:
+                os._exit(exit_code)
+
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+        # 자식이 부모의 연결을 닫지 않았으므로 부모 session은 계속 사용할 수 있다.
+        assert data_base.execute(text("SELECT 1")).scalar() == 1
+        assert database.engine is parent_engine
+        data_base.close()
+
+    def database_binds(self):
+        # 자식 process에서 table을 나눠 담은 database 파일을 사용해 본다. (부모의 engine과 설정은 바뀌지 않는다.)
+        directory = tempfile.mkdtemp(prefix="test_binds_")
+        bind_keys = ["chat", "auth", "analytics", "content"]
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                get_settings().SQLALCHEMY_DATABASE_URL = (
+                    f"sqlite:///{directory}/main.sqlite"
+                )
+                get_settings().SQLALCHEMY_DATABASE_BINDS = {
+                    bind_key: f"sqlite:///{directory}/{bind_key}.sqlite"
+                    for bind_key in bind_keys
+                }
+                database.recreate_database_engines_after_fork()
+                for bind_key, (bind_engine, _, _) in database.database_engines.items():
+                    Base.metadata.create_all(
+                        bind_engine, tables=database.get_bind_tables(bind_key)
+                    )
+
+                data_base = session_local()
+                user = models.User(
+                    name="bind", email="bind@example.com", password="", password_salt=""
+                )
+                board = models.Board(name="bind", information="bind")
+                data_base.add_all([user, board])
+                data_base.flush()
+                post = models.Post(
+                    name="bind", user_id=user.id, board_id=board.id, content="bind"
+                )
+                data_base.add(post)
+                data_base.flush()
+                data_base.add(models.PostViewIncrement(post_id=post.id))
+                data_base.commit()
+
+                # post는 content 파일에, 게시판의 게시글 수는 기본 파일에 저장된다.
+                content_engine = database.database_engines["content"][0]
+                analytics_engine = database.database_engines["analytics"][0]
+                with content_engine.connect() as connection:
+                    posts = connection.execute(
+                        text("SELECT count(*) FROM post")
+                    ).scalar()
+                    has_user_table = inspect(connection).has_table("user")
+                with analytics_engine.connect() as connection:
+                    increments = connection.execute(
+                        text("SELECT count(*) FROM post_view_increment")
+                    ).scalar()
+
+                if (
+                    posts == 1
+                    and increments == 1
+                    and not has_user_table
+                    and data_base.get(models.Board, board.id).number_of_post == 1
+                    and data_base.get_bind(models.Chat)
+                    is database.database_engines["chat"][0]
+                ):
+                    exit_code = 0
+                data_base.close()
+            finally:
+                os._exit(exit_code)
+
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+    def run_after_commit_callbacks(self):
+        called = []
+
+        def failing_callback():
+            raise RuntimeError("after commit callback")
+
+        # 앞의 callback이 실패해도 뒤의 callback은 실행되고 commit은 성공한다.
+        data_base = session_local()
+        database.run_after_commit(data_base, failing_callback)
+        database.run_after_commit(data_base, lambda: called.append(True))
+        data_base.commit()
+        data_base.close()
+
+        assert called == [True]
+
+    def write_locks(self):
+        def is_write_locked():
+            return any(
+                write_lock.locked()
+                for write_lock in database.database_write_locks.values()
+            )
+
+        # flush만 하고 commit하지 않은 동안에는 lock을 잡지 않는다.
+        data_base = session_local()
+        board = models.Board(name="write_lock", information="write_lock")
+        data_base.add(board)
+        data_base.flush()
+        assert not is_write_locked()
+        data_base.rollback()
+
+        # 쓰기와 commit을 함께 실행하는 동안에만 잡고 commit 후에는 놓는다.
+        def add_board(data_base):
+            data_base.add(models.Board(name="write_lock", information="write_lock"))
+            data_base.flush()
+            return is_write_locked()
+
+        assert database.run_and_commit(add_board, data_base)
+        assert not is_write_locked()
+
+        data_base.query(models.Board).filter_by(name="write_lock").delete()
+        database.commit_data_base(data_base)
+        assert not is_write_locked()
+        data_base.close()
+
     def read_main(self):
         response = client.get("/")
         assert response.status_code == 200
@@ -80,3 +253,15 @@ class TestMain:
 
     def test_read_main(self):
         main_test_methods.read_main()
+
+    def test_recreate_database_engines_after_fork(self):
+        main_test_methods.recreate_database_engines_after_fork()
+
+    def test_database_binds(self):
+        main_test_methods.database_binds()
+
+    def test_run_after_commit_callbacks(self):
+        main_test_methods.run_after_commit_callbacks()
+
+    def test_write_locks(self):
+        main_test_methods.write_locks()
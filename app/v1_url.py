@@ -19,6 +19,7 @@ ADMIN_GET_BOARD = "/get_board"
 ADMIN_GET_BOARDS = "/get_boards"
 ADMIN_UPDATE_BOARD = "/update_board"
 ADMIN_DELET_BOARD = "/delete_board"
+ADMIN_GET_SERVER_STATS = "/get_server_stats"
 
 AI_PREFIX = "/ai"
 AI_TRAIN_AI = "/train_ai"
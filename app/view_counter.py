@@ -0,0 +1,51 @@
+import threading
+
+
+class ShardedCounter:
+    def __init__(self, shard_count: int):
+        # key(게시글 id)마다 shard를 정해 lock을 나눠 잡는다.
+        # async 요청은 모두 event loop thread에서 들어오므로 thread가 아닌 key로 나눈다.
+        shard_count = max(1, shard_count)
+        self.shards: list[dict[int, int]] = [dict() for _ in range(shard_count)]
+        self.locks = [threading.Lock() for _ in range(shard_count)]
+
+    def get_shard_index(self, key: int) -> int:
+        return hash(key) % len(self.shards)
+
+    def add(self, key: int, amount: int = 1):
+        shard_index = self.get_shard_index(key)
+
+        with self.locks[shard_index]:
+            shard = self.shards[shard_index]
+            shard[key] = shard.get(key, 0) + amount
+
+    def add_all(self, counts: dict[int, int]):
+        for key, amount in counts.items():
+            self.add(key, amount)
+
+    def drain(self) -> dict[int, int]:
+        # shard의 dict를 새 dict로 바꿔 끼우고 lock 밖에서 합친다. (shard끼리 key가 겹치지 않는다.)
+        counts: dict[int, int] = dict()
+
+        for shard_index, lock in enumerate(self.locks):
+            with lock:
+                shard = self.shards[shard_index]
+                self.shards[shard_index] = dict()
+
+            counts.update(shard)
+
+        return counts
+
+    def clear(self):
+        for shard_index, lock in enumerate(self.locks):
+            with lock:
+                self.shards[shard_index] = dict()
+
+    def __len__(self):
+        count = 0
+
+        for shard_index, lock in enumerate(self.locks):
+            with lock:
+                count += len(self.shards[shard_index])
+
+        return count